@@ -1,23 +1,43 @@
 import dash
-from dash import html, dcc
+from dash import html, dcc, dash_table
 import plotly.graph_objects as go
 from threading import Timer
 import webbrowser
-import joblib
 import random
+import os
+import time
+import sys
+import uuid
+from functools import lru_cache
+from flask import jsonify
 
-from src.predict_sentiment import predict_sentiment
-from dash import Input, Output, State
+# Modules in src/ import each other by name, as when running src/main.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from predict_sentiment import predict_sentiment, current_generation, register_derived, start_model_watcher
+from sensitivity import sensitivity_sweep
+from explain import explain_sentiment
+import lookup_grid
+from request_coalescing import RequestCoalescer, Superseded
+from scenario_store import ScenarioStore, model_version
+from dash import Input, Output, State, ctx
+from dash.exceptions import PreventUpdate
 
 # Server constants
-port = 8050
+port = int(os.environ.get("SENTIMENT_PORT", 8050))
 host = "localhost"
 
-# Loading evaluating metrics
-metrics = joblib.load("models/model_metrics.joblib")
+# Live mode: seconds without typing before an input is sent to the server
+live_debounce = 0.15
+live_requests = RequestCoalescer()
+
+# Submitted scenarios, see src/scenario_store.py
+scenarios = ScenarioStore()
+scenario_page_size = 20
 
-avg_r2 = metrics["average"]["r2"]
-avg_mse = metrics["average"]["mse"]
+# Serve predictions from the precomputed grid, see src/lookup_grid.py
+if lookup_grid.serving_mode == "lookup":
+    lookup_grid.enable()
 
 # Metric-ranges for random input
 metric_ranges = {
@@ -30,6 +50,37 @@ metric_ranges = {
     "metric-7": (5, 11),             # UR
 }
 
+# Metric names as used by the models, in input order
+metric_features = {
+    "metric-1": "CPI",
+    "metric-2": "EC",
+    "metric-3": "GD",
+    "metric-4": "MSR",
+    "metric-5": "MIR",
+    "metric-6": "Pop",
+    "metric-7": "UR",
+}
+
+metric_labels = {
+    "CPI": "Consumer Price Index",
+    "EC": "Electricity Consumption",
+    "GD": "Government Debt",
+    "MSR": "Money Supply Growth",
+    "MIR": "Mortgage Interest Rate",
+    "Pop": "Population",
+    "UR": "Unemployment Rate",
+}
+
+metric_colors = {
+    "CPI": "#0d67df",
+    "EC": "#f28e2b",
+    "GD": "#59a14f",
+    "MSR": "#b07aa1",
+    "MIR": "#e15759",
+    "Pop": "#76b7b2",
+    "UR": "#9c755f",
+}
+
 def open_browser(host=host, port=port) -> None:
     """
     Call to Webbrowser to open server when running
@@ -63,6 +114,7 @@ def _metric_input(label: str, component_id: str, placeholder: str, info_text: st
                         id=component_id,
                         type="number",
                         placeholder=placeholder,
+                        debounce=True,
                         inputMode="decimal",
                         style={
                             "flex": 1,
@@ -104,6 +156,20 @@ def _metric_input(label: str, component_id: str, placeholder: str, info_text: st
         ],
     )
 
+def _model_info() -> list:
+    """
+    Evaluation metrics of the models currently serving predictions.
+    """
+
+    generation = current_generation()
+    metrics = generation.metrics
+
+    return [
+        html.Li(f"Model: {generation.backend.label}"),
+        html.Li(f"MSE score on test data: {metrics['average']['mse']:.3f}"),
+        html.Li(f"R² score on test data: {metrics['average']['r2']:.3f}"),
+    ]
+
 app = dash.Dash(__name__)
 
 # --- Remove default white border + add segmented control styling ---
@@ -229,7 +295,7 @@ bar_fig.update_layout(
 )
 
 # ---- Layout ----
-app.layout = html.Div(
+layout = html.Div(
     style={
         "minHeight": "100vh",
         "background": "linear-gradient(135deg, #0b1220 0%, #0f2b5b 40%, #0d67df 100%)",
@@ -308,20 +374,36 @@ app.layout = html.Div(
                                         "color": "#0b1220",
                                     },
                                 ),
-                                html.Button(
-                                    "Random",
-                                    id="random-btn",
-                                    n_clicks=0,
-                                    style={
-                                        "border": "none",
-                                        "borderRadius": "12px",
-                                        "padding": "8px 16px",
-                                        "fontWeight": "700",
-                                        "cursor": "pointer",
-                                        "color": "white",
-                                        "background": "linear-gradient(135deg, #0d67df 0%, #003d99 100%)",
-                                    },
-                                ),                                
+                                html.Div(
+                                    style={"display": "flex", "alignItems": "center", "gap": "12px"},
+                                    children=[
+                                        # Predict on Submit, or live while typing
+                                        dcc.RadioItems(
+                                            id="update-mode",
+                                            className="segmented",
+                                            options=[
+                                                {"label": "Submit", "value": "submit"},
+                                                {"label": "Live", "value": "live"},
+                                            ],
+                                            value="submit",
+                                            inline=True,
+                                        ),
+                                        html.Button(
+                                            "Random",
+                                            id="random-btn",
+                                            n_clicks=0,
+                                            style={
+                                                "border": "none",
+                                                "borderRadius": "12px",
+                                                "padding": "8px 16px",
+                                                "fontWeight": "700",
+                                                "cursor": "pointer",
+                                                "color": "white",
+                                                "background": "linear-gradient(135deg, #0d67df 0%, #003d99 100%)",
+                                            },
+                                        ),
+                                    ],
+                                ),
                             ],
                         ),
 
@@ -435,6 +517,190 @@ app.layout = html.Div(
                     ],
                 ),
 
+                # Card: Sensitivity
+                html.Div(
+                    style={
+                        "backgroundColor": "rgba(255,255,255,0.92)",
+                        "border": "1px solid rgba(255,255,255,0.18)",
+                        "borderRadius": "18px",
+                        "padding": "18px",
+                        "boxShadow": "0 12px 35px rgba(0,0,0,0.25)",
+                        "backdropFilter": "blur(6px)",
+                        "marginTop": "18px",
+                    },
+                    children=[
+                        html.Div(
+                            style={
+                                "display": "flex",
+                                "justifyContent": "space-between",
+                                "alignItems": "center",
+                                "gap": "10px",
+                                "flexWrap": "wrap",
+                                "marginBottom": "10px",
+                            },
+                            children=[
+                                html.H2(
+                                    "Sensitivity",
+                                    style={
+                                        "margin": "0",
+                                        "fontSize": "18px",
+                                        "fontWeight": "800",
+                                        "color": "#0b1220",
+                                    },
+                                ),
+                                dcc.Dropdown(
+                                    id="sweep-metric",
+                                    options=[
+                                        {"label": label, "value": feature}
+                                        for feature, label in metric_labels.items()
+                                    ],
+                                    value="MIR",
+                                    clearable=False,
+                                    style={"minWidth": "240px", "fontSize": "14px"},
+                                ),
+                            ],
+                        ),
+                        html.P(
+                            "How the predicted polls change when one metric varies and the others keep their submitted values.",
+                            style={
+                                "margin": "0 0 10px 0",
+                                "fontSize": "12px",
+                                "color": "rgba(11,18,32,0.75)",
+                            },
+                        ),
+                        dcc.Graph(
+                            id="sweep-chart",
+                            config={"displayModeBar": False},
+                            style={"width": "100%"},
+                        ),
+                    ],
+                ),
+
+                # Card: Attributions
+                html.Div(
+                    style={
+                        "backgroundColor": "rgba(255,255,255,0.92)",
+                        "border": "1px solid rgba(255,255,255,0.18)",
+                        "borderRadius": "18px",
+                        "padding": "18px",
+                        "boxShadow": "0 12px 35px rgba(0,0,0,0.25)",
+                        "backdropFilter": "blur(6px)",
+                        "marginTop": "18px",
+                    },
+                    children=[
+                        html.H2(
+                            "Why these predictions?",
+                            style={
+                                "margin": "0 0 10px 0",
+                                "fontSize": "18px",
+                                "fontWeight": "800",
+                                "color": "#0b1220",
+                            },
+                        ),
+                        html.P(
+                            "How much each metric moves every party's prediction away from its average over the training data (percentage points).",
+                            style={
+                                "margin": "0 0 10px 0",
+                                "fontSize": "12px",
+                                "color": "rgba(11,18,32,0.75)",
+                            },
+                        ),
+                        dcc.Graph(
+                            id="explain-chart",
+                            config={"displayModeBar": False},
+                            style={"width": "100%"},
+                        ),
+                    ],
+                ),
+
+                # Card: Saved scenarios
+                html.Div(
+                    style={
+                        "backgroundColor": "rgba(255,255,255,0.92)",
+                        "border": "1px solid rgba(255,255,255,0.18)",
+                        "borderRadius": "18px",
+                        "padding": "18px",
+                        "boxShadow": "0 12px 35px rgba(0,0,0,0.25)",
+                        "backdropFilter": "blur(6px)",
+                        "marginTop": "18px",
+                    },
+                    children=[
+                        html.Div(
+                            style={
+                                "display": "flex",
+                                "justifyContent": "space-between",
+                                "alignItems": "center",
+                                "gap": "10px",
+                                "flexWrap": "wrap",
+                                "marginBottom": "10px",
+                            },
+                            children=[
+                                html.H2(
+                                    "Saved scenarios",
+                                    style={
+                                        "margin": "0",
+                                        "fontSize": "18px",
+                                        "fontWeight": "800",
+                                        "color": "#0b1220",
+                                    },
+                                ),
+                                html.Div(
+                                    style={"display": "flex", "gap": "8px"},
+                                    children=[
+                                        html.Button(
+                                            label,
+                                            id=button_id,
+                                            n_clicks=0,
+                                            style={
+                                                "border": "none",
+                                                "borderRadius": "12px",
+                                                "padding": "8px 16px",
+                                                "fontWeight": "700",
+                                                "cursor": "pointer",
+                                                "color": "white",
+                                                "background": "linear-gradient(135deg, #0d67df 0%, #003d99 100%)",
+                                            },
+                                        )
+                                        for label, button_id in [("Newer", "scenarios-newer-btn"), ("Older", "scenarios-older-btn")]
+                                    ],
+                                ),
+                            ],
+                        ),
+                        html.P(
+                            "Every submitted scenario is saved with its predictions. Select scenarios to compare them.",
+                            style={
+                                "margin": "0 0 10px 0",
+                                "fontSize": "12px",
+                                "color": "rgba(11,18,32,0.75)",
+                            },
+                        ),
+                        # Ids starting the current page and the pages before it
+                        dcc.Store(id="scenario-cursors", data=[None]),
+                        # Set once a submitted scenario has been queued for saving
+                        dcc.Store(id="submitted-scenario"),
+                        dash_table.DataTable(
+                            id="scenario-table",
+                            columns=(
+                                [{"name": "#", "id": "id"}, {"name": "Saved", "id": "created"}, {"name": "Model", "id": "model_version"}]
+                                + [{"name": f, "id": f} for f in metric_features.values()]
+                                + [{"name": p, "id": p, "type": "numeric", "format": {"specifier": ".1f"}} for p in parties]
+                            ),
+                            data=[],
+                            row_selectable="multi",
+                            selected_rows=[],
+                            page_action="none",
+                            style_table={"overflowX": "auto"},
+                            style_cell={"fontSize": "12px", "padding": "4px 8px", "fontFamily": "inherit"},
+                            style_header={"fontWeight": "700"},
+                        ),
+                        dcc.Graph(
+                            id="scenario-compare-chart",
+                            config={"displayModeBar": False},
+                            style={"width": "100%"},
+                        ),
+                    ],
+                ),
+
                 # Card: Model info
                 html.Div(
                     style={
@@ -459,11 +725,8 @@ app.layout = html.Div(
                             },
                         ),
                         html.Ul(
-                            children=[
-                                html.Li("Model: Random Forest"),
-                                html.Li(f"MSE score on test data: {avg_mse:.3f}"),
-                                html.Li(f"R² score on test data: {avg_r2:.3f}"),
-                            ],
+                            id="model-info",
+                            children=_model_info(),
                             style={"margin": "0", "paddingLeft": "20px", "fontSize": "14px"},
                         ),
                     ],
@@ -484,8 +747,69 @@ app.layout = html.Div(
     ],
 )
 
+def serve_layout():
+    """
+    The layout is served anew on every page load, with an id identifying the
+    browser tab for live updates.
+    """
+
+    return html.Div([dcc.Store(id="session-id", data=uuid.uuid4().hex), layout])
+
+app.layout = serve_layout
+
+@app.server.route("/_live-metrics")
+def live_metrics():
+    # Live update requests received, computed and coalesced
+    return jsonify(live_requests.stats())
+
+def _poll_figure(predictions: dict):
+    """
+    Bar chart of the predictions, normalized to sum to 100 percent.
+    """
+
+    # Keep party order consistent with chart
+    parties = ["M", "L", "C", "KD", "S", "V", "MP", "SD"]
+    values = [predictions[p] for p in parties]
+    factor = 100 / sum(values)
+    values = [v * factor for v in values]  
+
+    fig = go.Figure(
+        data=[
+            go.Bar(
+                x=parties,
+                y=values,
+                marker=dict(color=[party_colors[p] for p in parties]),
+            )
+        ]
+    )
+
+    fig.update_layout(
+        xaxis_title="Party",
+        yaxis_title="Predicted percentage",
+        margin=dict(l=30, r=30, t=30, b=30),
+        height=420,
+        yaxis_range=[0, 50],
+        shapes=[  
+            dict(
+                type="line",
+                x0=-0.5,     
+                x1=7.5,       
+                y0=4,         
+                y1=4,        
+                line=dict(
+                    color="red", 
+                    width=2, 
+                    dash="dash"  
+                ),
+            )
+        ]
+    )
+
+    return fig
+
 @app.callback(
     Output("party-bar-chart", "figure"),
+    Output("submitted-scenario", "data"),
     Input("submit-btn", "n_clicks"),
     State("metric-1", "value"),  # CPI
     State("metric-2", "value"),  # EC
@@ -508,49 +832,262 @@ def predict(n_clicks, cpi, ec, gd, msr, mir, pop, ur):
         'Pop': pop,
         'UR': ur
         }
-    
-    predictions = predict_sentiment(user_input)
-    
-    # Keep party order consistent with chart
-    parties = ["M", "L", "C", "KD", "S", "V", "MP", "SD"]
-    values = [predictions[p] for p in parties]
-    factor = 100 / sum(values)
-    values = [v * factor for v in values]  
+
+    if any(v is None for v in user_input.values()):
+        raise PreventUpdate
+
+    generation = current_generation()
+    version = model_version(generation)
+
+    # Repeated scenarios are served from the store, new ones saved in the background
+    predictions = scenarios.get(version, user_input)
+    if predictions is None:
+        predictions = predict_sentiment(user_input, generation)
+        scenarios.add(version, user_input, predictions)
+
+    return _poll_figure(predictions), n_clicks
+
+@app.callback(
+    Output("party-bar-chart", "figure", allow_duplicate=True),
+    [Input(metric_id, "value") for metric_id in metric_features],
+    Input("update-mode", "value"),
+    State("session-id", "data"),
+    prevent_initial_call=True,
+)
+
+def predict_live(*args):
+    *values, mode, session_id = args
+
+    # Half-typed or empty inputs keep the last prediction
+    if mode != "live" or any(v is None for v in values):
+        raise PreventUpdate
+
+    user_input = dict(zip(metric_features.values(), values))
+
+    # Only the newest scenario of a burst of keystrokes is computed
+    try:
+        predictions = live_requests.run(session_id, predict_sentiment, user_input)
+    except Superseded:
+        raise PreventUpdate
+
+    return _poll_figure(predictions)
+
+@app.callback(
+    [Output(metric_id, "debounce") for metric_id in metric_features],
+    Input("update-mode", "value"),
+)
+
+def set_debounce(mode):
+    # Without live mode, inputs are only read on Submit
+    debounce = live_debounce if mode == "live" else True
+    return [debounce] * len(metric_features)
+
+@app.callback(
+    Output("explain-chart", "figure"),
+    Input("submit-btn", "n_clicks"),
+    [State(metric_id, "value") for metric_id in metric_features],
+    prevent_initial_call=True,
+)
+
+def explain(n_clicks, *values):
+
+    if any(v is None for v in values):
+        raise PreventUpdate
+
+    try:
+        explanation = explain_sentiment(dict(zip(metric_features.values(), values)))
+    except ValueError as e:
+        fig = go.Figure()
+        fig.update_layout(
+            height=420,
+            xaxis=dict(visible=False),
+            yaxis=dict(visible=False),
+            annotations=[dict(text=str(e), showarrow=False, font=dict(size=14))],
+        )
+        return fig
+
+    explanation = explanation.loc[parties]
 
     fig = go.Figure(
         data=[
             go.Bar(
                 x=parties,
-                y=values,
-                marker=dict(color=[party_colors[p] for p in parties]),
+                y=explanation[feature],
+                name=metric_labels[feature],
+                marker=dict(color=metric_colors[feature]),
             )
+            for feature in metric_features.values()
         ]
     )
 
     fig.update_layout(
+        barmode="relative",
         xaxis_title="Party",
+        yaxis_title="Contribution (percentage points)",
+        margin=dict(l=30, r=30, t=30, b=30),
+        height=420,
+    )
+
+    return fig
+
+def _sweeper(generation):
+    """
+    Cached sweeps of one generation of models, so switching metric in the
+    dropdown does not recompute. Reloaded models get a cache of their own,
+    and the curves are always computed by the models they are cached for.
+    """
+
+    @lru_cache(maxsize=32)
+    def sweep(base: tuple) -> dict:
+        return sensitivity_sweep(dict(zip(metric_features.values(), base)), generation=generation)
+
+    return sweep
+
+register_derived("sweeps", _sweeper)
+
+@app.callback(
+    Output("sweep-chart", "figure"),
+    Input("submit-btn", "n_clicks"),
+    Input("sweep-metric", "value"),
+    [State(metric_id, "value") for metric_id in metric_features],
+    prevent_initial_call=True,
+)
+
+def sweep(n_clicks, feature, *values):
+
+    if any(v is None for v in values):
+        raise PreventUpdate
+
+    base = dict(zip(metric_features.values(), values))
+    curve = current_generation().derived["sweeps"](tuple(float(v) for v in values))[feature]
+
+    # Same normalization as the bar chart
+    curve = curve.div(curve.sum(axis=1), axis=0) * 100
+
+    fig = go.Figure(
+        data=[
+            go.Scatter(
+                x=curve.index,
+                y=curve[p],
+                name=p,
+                mode="lines",
+                line=dict(color=party_colors[p], width=2, shape="hv"),
+            )
+            for p in parties
+        ]
+    )
+
+    fig.update_layout(
+        xaxis_title=metric_labels[feature],
         yaxis_title="Predicted percentage",
         margin=dict(l=30, r=30, t=30, b=30),
         height=420,
         yaxis_range=[0, 50],
-        shapes=[  
+        shapes=[
+            # Submitted value
             dict(
                 type="line",
-                x0=-0.5,     
-                x1=7.5,       
-                y0=4,         
-                y1=4,        
-                line=dict(
-                    color="red", 
-                    width=2, 
-                    dash="dash"  
-                ),
+                x0=base[feature],
+                x1=base[feature],
+                y0=0,
+                y1=50,
+                line=dict(color="rgba(11,18,32,0.5)", width=1, dash="dot"),
+            )
+        ]
+    )
+
+    return fig
+
+@app.callback(
+    Output("scenario-table", "data"),
+    Output("scenario-table", "selected_rows"),
+    Output("scenario-cursors", "data"),
+    Input("submitted-scenario", "data"),
+    Input("scenarios-newer-btn", "n_clicks"),
+    Input("scenarios-older-btn", "n_clicks"),
+    State("scenario-table", "data"),
+    State("scenario-cursors", "data"),
+)
+
+def list_scenarios(submitted, newer_clicks, older_clicks, rows, cursors):
+
+    rows, cursors = rows or [], cursors or [None]
+
+    if ctx.triggered_id == "scenarios-older-btn":
+        # A full page may be followed by older scenarios, queued ones have no id yet
+        written = [row["id"] for row in rows if row["id"] is not None]
+        if len(rows) < scenario_page_size or not written:
+            raise PreventUpdate
+        cursors = cursors + [written[-1]]
+    elif ctx.triggered_id == "scenarios-newer-btn":
+        if len(cursors) == 1:
+            raise PreventUpdate
+        cursors = cursors[:-1]
+    else:
+        # Newest page, with the scenario just submitted even if it is still queued
+        cursors = [None]
+
+    page = scenarios.page(before=cursors[-1], limit=scenario_page_size)
+    if not page and len(cursors) > 1:
+        raise PreventUpdate
+
+    for row in page:
+        row["created"] = time.strftime("%Y-%m-%d %H:%M", time.localtime(row.pop("created_at")))
+
+    return page, [], cursors
+
+@app.callback(
+    Output("scenario-compare-chart", "figure"),
+    Input("scenario-table", "selected_rows"),
+    State("scenario-table", "data"),
+)
+
+def compare_scenarios(selected_rows, rows):
+
+    selected = [rows[i] for i in selected_rows or []]
+
+    if not selected:
+        fig = go.Figure()
+        fig.update_layout(
+            height=120,
+            xaxis=dict(visible=False),
+            yaxis=dict(visible=False),
+            annotations=[dict(text="Select scenarios in the table to compare them", showarrow=False, font=dict(size=14))],
+        )
+        return fig
+
+    fig = go.Figure(
+        data=[
+            go.Bar(
+                x=parties,
+                # Same normalization as the poll chart
+                y=[row[p] * 100 / sum(row[q] for q in parties) for p in parties],
+                name=f"#{row['id']}" if row["id"] is not None else "New",
             )
+            for row in selected
         ]
     )
 
+    fig.update_layout(
+        barmode="group",
+        xaxis_title="Party",
+        yaxis_title="Predicted percentage",
+        margin=dict(l=30, r=30, t=30, b=30),
+        height=420,
+        yaxis_range=[0, 50],
+    )
+
     return fig
 
+@app.callback(
+    Output("model-info", "children"),
+    Input("submit-btn", "n_clicks"),
+)
+
+def refresh_model_info(n_clicks):
+    # Models may have been reloaded since the page was served
+    return _model_info()
+
 for i in range(1, 8):  # Callback for all 7 metrics
     @app.callback(
         Output(f"metric-{i}-info", "style"),
@@ -583,5 +1120,9 @@ def randomize_metrics(n_clicks):
     return values
 
 if __name__ == "__main__":
-    Timer(1, open_browser).start()
+    # Pick up models retrained with src/main.py without restarting
+    start_model_watcher()
+    # Set SENTIMENT_NO_BROWSER when starting the server from scripts
+    if not os.environ.get("SENTIMENT_NO_BROWSER"):
+        Timer(1, open_browser).start()
     app.run(debug=False, port=port, host=host)
@@ -0,0 +1,83 @@
+"""
+Fit time, prediction latency, artifact size and R² of every model backend.
+
+Run from the project root:
+
+    python benchmarks/backends.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import r2_score
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from backends import backends
+from data_loader import load_data, get_X
+from main import files, parties
+from train_models import split_parameters
+
+def benchmark(backend, X_train, X_test, Y_train, Y_test, batch: pd.DataFrame) -> dict:
+    start = time.perf_counter()
+    models = {party: backend.make_estimator().fit(X_train, Y_train[party]) for party in parties}
+    fit_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        size = 0
+        for party, model in models.items():
+            path = os.path.join(tmp, f"{backend.file_prefix}_{party}.joblib")
+            joblib.dump(model, path)
+            size += os.path.getsize(path)
+
+    predict = backend.predictor(models, parties)
+
+    row = X_test.iloc[[0]]
+    single = []
+    for _ in range(200):
+        start = time.perf_counter()
+        predict(row)
+        single.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    predict(batch)
+    batch_time = time.perf_counter() - start
+
+    Y_pred = predict(X_test)
+    r2 = np.mean([r2_score(Y_test[party], Y_pred[:, i]) for i, party in enumerate(parties)])
+
+    return {
+        "backend": backend.name,
+        "fit_s": fit_time,
+        "single_row_ms": np.median(single) * 1000,
+        f"batch_{len(batch)}_ms": batch_time * 1000,
+        "size_kb": size / 1024,
+        "r2": r2,
+    }
+
+def main(batch_size: int = 100_000):
+    df = load_data(files)
+    X = get_X(df)
+    Y = df[parties]
+
+    X_train, X_test, Y_train, Y_test = train_test_split(X, Y, **split_parameters)
+
+    rng = np.random.default_rng(42)
+    batch = pd.DataFrame(
+        {c: rng.uniform(X[c].min(), X[c].max(), batch_size) for c in X.columns}
+    )
+
+    results = [
+        benchmark(backend(), X_train, X_test, Y_train, Y_test, batch)
+        for backend in backends.values()
+    ]
+
+    print(pd.DataFrame(results).set_index("backend").round(3).to_string())
+
+if __name__ == "__main__":
+    main()
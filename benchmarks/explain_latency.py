@@ -0,0 +1,63 @@
+"""
+Latency of single-scenario feature attributions for all eight parties.
+
+Run from the project root:
+
+    python benchmarks/explain_latency.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from explain import explain_sentiment
+from predict_sentiment import predict_sentiment, current_generation
+
+# Typical ranges, as in app.py
+ranges = {
+    "CPI": (250, 420),
+    "EC": (5000, 20000),
+    "GD": (1000000, 1300000),
+    "MSR": (-15, 20),
+    "MIR": (1, 6),
+    "Pop": (10300000, 10500000),
+    "UR": (5, 11),
+}
+
+def main(n_scenarios: int = 200):
+    generation = current_generation()
+    features = generation.features
+    rng = np.random.default_rng(42)
+    scenarios = [
+        {feature: rng.uniform(*ranges[feature]) for feature in features}
+        for _ in range(n_scenarios)
+    ]
+
+    cold = []
+    for scenario in scenarios:
+        start = time.perf_counter()
+        explanation = explain_sentiment(scenario)
+        cold.append(time.perf_counter() - start)
+
+    warm = []
+    for scenario in scenarios:
+        start = time.perf_counter()
+        explain_sentiment(scenario)
+        warm.append(time.perf_counter() - start)
+
+    # Attributions plus base value must add up to the prediction
+    predictions = predict_sentiment(scenarios[-1])
+    error = max(abs(explanation.sum(axis=1)[p] - predictions[p]) for p in predictions)
+
+    cold = np.array(cold) * 1000
+    warm = np.array(warm) * 1000
+    print(f"Scenarios: {n_scenarios}, cache: {generation.derived['explainer'].cache_info().currsize} entries")
+    print(f"Uncached: p50 {np.percentile(cold, 50):.1f} ms, p95 {np.percentile(cold, 95):.1f} ms, max {cold.max():.1f} ms")
+    print(f"Cached:   p50 {np.percentile(warm, 50):.3f} ms, p95 {np.percentile(warm, 95):.3f} ms")
+    print(f"Max additivity error: {error:.2e}")
+
+if __name__ == "__main__":
+    main()
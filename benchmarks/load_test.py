@@ -0,0 +1,286 @@
+"""
+Load test for the Dash server.
+
+Simulated users click Submit, Random and the info buttons, which sends the
+same /_dash-update-component requests as the browser. Latency percentiles,
+error rate and throughput per callback are printed and written as JSON.
+
+Run from the project root, against a server that is already running:
+
+    python benchmarks/load_test.py --users 20 --ramp 10 --duration 60
+
+or let the tool start a local server on the given port and stop it afterwards:
+
+    python benchmarks/load_test.py --start-server --url http://localhost:8060
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Typical ranges, as in app.py
+metric_ranges = {
+    "metric-1": (250, 420),
+    "metric-2": (5000, 20000),
+    "metric-3": (1000000, 1300000),
+    "metric-4": (-15, 20),
+    "metric-5": (1, 6),
+    "metric-6": (10300000, 10500000),
+    "metric-7": (5, 11),
+}
+
+# Button clicked for each user action
+actions = {
+    "submit": lambda: "submit-btn",
+    "random": lambda: "random-btn",
+    "info": lambda: f"metric-{random.randint(1, 7)}-btn",
+}
+
+def _parse_output(output: str):
+    """
+    Dash encodes multiple outputs as '..a.prop...b.prop..'.
+    """
+
+    if output.startswith(".."):
+        parts = output[2:-2].split("...")
+        return [dict(zip(("id", "property"), p.rsplit(".", 1))) for p in parts]
+
+    return dict(zip(("id", "property"), output.rsplit(".", 1)))
+
+def _label(output: str) -> str:
+    """
+    Short name of a callback for the report. The seven info toggles are
+    reported together.
+    """
+
+    outputs = _parse_output(output)
+    if isinstance(outputs, list):
+        return f"{outputs[0]['id']}.{outputs[0]['property']} (+{len(outputs) - 1} outputs)"
+
+    return re.sub(r"metric-\d-info", "metric-N-info", output)
+
+def _value(component_id: str, prop: str, n_clicks: int):
+    """
+    A value for an input or state like the browser would send it.
+    """
+
+    if prop == "n_clicks":
+        return n_clicks
+    if component_id in metric_ranges and prop == "value":
+        return round(random.uniform(*metric_ranges[component_id]), 2)
+    if component_id == "sweep-metric":
+        return random.choice(["CPI", "EC", "GD", "MSR", "MIR", "Pop", "UR"])
+    if component_id.endswith("-info") and prop == "style":
+        return {"display": random.choice(["none", "block"])}
+    return None
+
+def load_callbacks(url: str) -> dict:
+    """Map each button to the callbacks a click on it triggers.
+
+    Returns
+    -------
+    callbacks : dict
+        Dictionary mapping button ids to lists of callback dependencies,
+        as served by /_dash-dependencies.
+    """
+
+    dependencies = requests.get(f"{url}/_dash-dependencies", timeout=30).json()
+    callbacks = {}
+
+    for dep in dependencies:
+        if dep.get("clientside_function"):
+            continue
+        for i in dep["inputs"]:
+            if i["property"] == "n_clicks":
+                callbacks.setdefault(i["id"], []).append(dep)
+
+    return callbacks
+
+def build_payload(dep: dict, button: str, n_clicks: int) -> dict:
+    """
+    Request body of /_dash-update-component for one callback.
+    """
+
+    inputs = [
+        {**i, "value": _value(i["id"], i["property"], n_clicks)}
+        for i in dep["inputs"]
+    ]
+    state = [
+        {**s, "value": _value(s["id"], s["property"], n_clicks)}
+        for s in dep["state"]
+    ]
+
+    return {
+        "output": dep["output"],
+        "outputs": _parse_output(dep["output"]),
+        "inputs": inputs,
+        "changedPropIds": [f"{button}.n_clicks"],
+        "state": state,
+    }
+
+class Recorder:
+    """
+    Thread-safe collection of (callback, latency, ok) samples.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []
+
+    def add(self, name: str, latency: float, ok: bool) -> None:
+        with self.lock:
+            self.samples.append((name, latency, ok))
+
+def user(url: str, callbacks: dict, mix: dict, stop_at: float, think: float, recorder: Recorder) -> None:
+    """
+    One simulated user, clicking buttons until `stop_at`.
+    """
+
+    session = requests.Session()
+    names, weights = list(mix), list(mix.values())
+    n_clicks = 0
+
+    while time.time() < stop_at:
+        n_clicks += 1
+        button = actions[random.choices(names, weights)[0]]()
+
+        for dep in callbacks.get(button, []):
+            payload = build_payload(dep, button, n_clicks)
+            start = time.perf_counter()
+            try:
+                r = session.post(f"{url}/_dash-update-component", json=payload, timeout=60)
+                # 204 is Dash's answer when a callback prevents the update
+                ok = r.status_code in (200, 204)
+            except requests.RequestException:
+                ok = False
+            recorder.add(_label(dep["output"]), time.perf_counter() - start, ok)
+
+        if think > 0:
+            time.sleep(random.expovariate(1 / think))
+
+def summarize(samples: list, elapsed: float) -> dict:
+    """
+    Latency percentiles, error rate and throughput, overall and per callback.
+    """
+
+    def stats(rows):
+        latencies = np.array([r[1] for r in rows]) * 1000
+        errors = sum(1 for r in rows if not r[2])
+        return {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": errors / len(rows),
+            "throughput_rps": len(rows) / elapsed,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max()),
+        }
+
+    report = {"elapsed_s": elapsed, "overall": stats(samples) if samples else None, "callbacks": {}}
+    for name in sorted({s[0] for s in samples}):
+        report["callbacks"][name] = stats([s for s in samples if s[0] == name])
+
+    return report
+
+def start_server(url: str) -> subprocess.Popen:
+    """
+    Start app.py on the port of `url` and wait until it answers.
+    """
+
+    env = dict(os.environ, SENTIMENT_NO_BROWSER="1", SENTIMENT_PORT=str(urlparse(url).port or 8050))
+    server = subprocess.Popen(
+        [sys.executable, "app.py"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return server
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+
+    server.terminate()
+    raise RuntimeError("Server did not start within 120 s")
+
+def run(url: str, users: int, ramp: float, duration: float, think: float, mix: dict) -> dict:
+    callbacks = load_callbacks(url)
+    recorder = Recorder()
+
+    start = time.time()
+    stop_at = start + ramp + duration
+    threads = []
+
+    # Users join evenly over the ramp period
+    for i in range(users):
+        t = threading.Thread(target=user, args=(url, callbacks, mix, stop_at, think, recorder), daemon=True)
+        t.start()
+        threads.append(t)
+        if ramp > 0 and i < users - 1:
+            time.sleep(ramp / max(users - 1, 1))
+
+    for t in threads:
+        t.join()
+
+    report = summarize(recorder.samples, time.time() - start)
+    report["config"] = {"url": url, "users": users, "ramp_s": ramp, "duration_s": duration, "think_s": think, "mix": mix}
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Dash server.")
+    parser.add_argument("--url", default="http://localhost:8050", help="server address (default http://localhost:8050)")
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users (default 10)")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds until all users are active (default 5)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds at full load after the ramp (default 30)")
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between clicks in seconds (default 0)")
+    parser.add_argument("--mix", default="submit=6,random=2,info=2", help="relative weights of the user actions")
+    parser.add_argument("--report", default="load_test_report.json", help="JSON report file")
+    parser.add_argument("--start-server", action="store_true", help="start app.py for the test and stop it afterwards")
+    args = parser.parse_args()
+
+    mix = {name: float(weight) for name, weight in (item.split("=") for item in args.mix.split(","))}
+    unknown = set(mix) - set(actions)
+    if unknown:
+        sys.exit(f"Unknown actions in --mix: {', '.join(unknown)}, choose from: {', '.join(actions)}")
+
+    url = args.url.rstrip("/")
+    server = start_server(url) if args.start_server else None
+
+    try:
+        report = run(url, args.users, args.ramp, args.duration, args.think, mix)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'callback':<40} {'requests':>9} {'errors':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    rows = list(report["callbacks"].items()) + [("overall", report["overall"])]
+    for name, s in rows:
+        if s is None:
+            continue
+        print(f"{name:<40} {s['requests']:>9} {s['errors']:>7} {s['throughput_rps']:>8.1f} "
+              f"{s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f}")
+    print(f"Report saved to {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Time of the monthly poll aggregation on a synthetic poll log.
+
+Runs `monthly_weighted_average` and `linear_interpolation` from
+data/get_poll_data.py and the previous per-party loops on the same polls,
+checks that the outputs are identical and prints both timings.
+
+Run from the project root:
+
+    python benchmarks/poll_aggregation.py --polls 3000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+
+from get_poll_data import party_cols, monthly_weighted_average, linear_interpolation
+
+def reference_monthly_weighted_average(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The previous implementation, one set of groupbys per party.
+    """
+
+    new_df = df.copy()
+    global_mean_n = new_df["n"].mean()
+    new_df["n"] = new_df.groupby("date")["n"].transform(lambda s: s.fillna(s.mean()))
+    new_df["n"] = new_df["n"].fillna(global_mean_n).astype(float)
+
+    out = pd.DataFrame(index=new_df.groupby("date").size().index)
+    for c in party_cols:
+        x = new_df[c]
+        w_used = new_df["n"].where(x.notna(), 0.0)
+        weighted_sum = (x.fillna(0.0) * w_used).groupby(new_df["date"]).sum()
+        weight_sum = w_used.groupby(new_df["date"]).sum()
+        out[c] = weighted_sum / weight_sum.replace(0, pd.NA)
+
+    return out.sort_index(ascending=False).reset_index()
+
+def reference_linear_interpolation(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The previous implementation, one slice write per party.
+    """
+
+    new_df = df.copy()
+    new_df[party_cols] = new_df[party_cols].apply(pd.to_numeric, errors="coerce")
+    new_df = new_df.set_index("date").sort_index()
+    full_range = pd.period_range(new_df.index.min(), new_df.index.max(), freq="M")
+    new_df = new_df.reindex(full_range)
+    new_df.index.name = "date"
+
+    for col in party_cols:
+        s = new_df[col]
+        first, last = s.first_valid_index(), s.last_valid_index()
+        new_df.loc[first:last, col] = s.loc[first:last].interpolate(method="linear")
+
+    return new_df.reset_index().sort_values("date", ascending=False).reset_index(drop=True)
+
+def synthetic_polls(n_polls: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Individual polls in the shape `drop_excess_columns` returns: a monthly
+    date, a sample size that is sometimes missing, and party shares that
+    are missing before a party is first polled and in some single polls.
+    Some months have no polls at all, so that interpolation has gaps to fill.
+    """
+
+    rng = np.random.default_rng(seed)
+    months = pd.period_range("1970-01", "2025-12", freq="M")
+    polled = months[rng.random(len(months)) > 0.1]
+
+    date = polled[rng.integers(0, len(polled), n_polls)]
+    n = rng.integers(500, 3000, n_polls).astype(float)
+    n[rng.random(n_polls) < 0.2] = np.nan
+
+    df = pd.DataFrame({"date": date, "n": n})
+    for i, party in enumerate(party_cols):
+        share = rng.uniform(2, 40, n_polls)
+        share[rng.random(n_polls) < 0.05] = np.nan
+        # Parties enter the polls at different times
+        share[np.asarray(date < months[i * 40])] = np.nan
+        df[party] = share
+
+    return df
+
+def _timed(f, *args):
+    start = time.perf_counter()
+    result = f(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the monthly poll aggregation.")
+    parser.add_argument("--polls", type=int, default=3_000_000, help="number of synthetic polls (default 3000000)")
+    args = parser.parse_args()
+
+    polls = synthetic_polls(args.polls)
+
+    reference_monthly, reference_avg = _timed(reference_monthly_weighted_average, polls)
+    monthly, avg = _timed(monthly_weighted_average, polls)
+
+    # The previous columns were object dtype with pd.NA for months without
+    # weight, the values must match exactly
+    as_float = reference_monthly.copy()
+    as_float[party_cols] = as_float[party_cols].apply(pd.to_numeric, errors="coerce").astype(float)
+    pd.testing.assert_frame_equal(monthly, as_float, check_exact=True)
+
+    # Drop some months so that there are gaps to interpolate
+    dropped = monthly.index[1::7]
+    reference, reference_interp = _timed(
+        reference_linear_interpolation, reference_monthly.drop(index=dropped).reset_index(drop=True)
+    )
+    interpolated, interp = _timed(linear_interpolation, monthly.drop(index=dropped).reset_index(drop=True))
+    pd.testing.assert_frame_equal(interpolated, reference, check_exact=True)
+
+    print(f"Polls: {args.polls:,}, months: {len(reference):,}, outputs identical")
+    print(f"monthly_weighted_average: {reference_avg:.2f} s -> {avg:.2f} s ({reference_avg / avg:.1f}x)")
+    print(f"linear_interpolation:     {reference_interp * 1000:.1f} ms -> {interp * 1000:.1f} ms "
+          f"({reference_interp / interp:.1f}x)")
+
+if __name__ == "__main__":
+    main()
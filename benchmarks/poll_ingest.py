@@ -0,0 +1,159 @@
+"""
+Parse time and peak memory of reading the upstream poll file.
+
+Compares reading the whole of Polls.csv and running `convert_date`,
+`drop_excess_columns` and `monthly_weighted_average` with the streaming
+`read_monthly_polls` from data/get_poll_data.py. Each path runs in its own
+process so that their peak memory is measured separately, and the monthly
+averages and the final interpolated, normalized output are compared.
+
+Pass a local copy of the upstream file, or leave it out to generate a
+synthetic file in the same layout. Run from the project root:
+
+    python benchmarks/poll_ingest.py --polls-file Polls.csv
+    python benchmarks/poll_ingest.py --polls 3000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+
+from get_poll_data import (
+    party_cols, convert_date, drop_excess_columns, monthly_weighted_average,
+    read_monthly_polls, linear_interpolation, normalize_percentages
+)
+
+# Column order of Polls.csv in the SwedishPolls repository
+upstream_columns = [
+    "PublYearMonth", "Company", "M", "L", "KD", "C", "S", "MP", "V", "SD", "FI",
+    "Uncertain", "n", "PublDate", "collectPeriodFrom", "collectPeriodTo",
+    "approxPeriod", "house"
+]
+
+def synthetic_polls_file(path: str, n_polls: int, seed: int = 42) -> None:
+    """
+    Write polls in the upstream layout: Swedish month abbreviations,
+    "NA" for missing values, and the text and date columns the
+    aggregation does not use.
+    """
+
+    rng = np.random.default_rng(seed)
+    months = pd.period_range("1970-01", "2025-12", freq="M")
+    names = np.array(["jan", "feb", "mar", "apr", "maj", "jun", "jul", "aug", "sep", "okt", "nov", "dec"])
+    companies = np.array(["Demoskop", "Ipsos", "Novus", "SCB", "Sifo", "Skop", "Indikator", "YouGov"])
+
+    for first in range(0, n_polls, 500_000):
+        size = min(500_000, n_polls - first)
+        month = months[rng.integers(0, len(months), size)]
+        day = pd.Series(month.to_timestamp() + pd.to_timedelta(rng.integers(0, 28, size), unit="D"))
+
+        df = pd.DataFrame({
+            "PublYearMonth": month.year.astype(str) + "-" + names[month.month - 1],
+            "Company": companies[rng.integers(0, len(companies), size)],
+        })
+        for party in ["M", "L", "KD", "C", "S", "MP", "V", "SD", "FI"]:
+            share = rng.uniform(1, 40, size).round(1)
+            share[rng.random(size) < 0.05] = np.nan
+            df[party] = share
+        df["Uncertain"] = np.where(rng.random(size) < 0.5, rng.uniform(2, 15, size).round(1), np.nan)
+        n = rng.integers(500, 3000, size).astype(float)
+        n[rng.random(size) < 0.2] = np.nan
+        df["n"] = n
+        df["PublDate"] = day.dt.strftime("%Y-%m-%d")
+        df["collectPeriodFrom"] = (day - pd.Timedelta(days=7)).dt.strftime("%Y-%m-%d")
+        df["collectPeriodTo"] = (day - pd.Timedelta(days=1)).dt.strftime("%Y-%m-%d")
+        df["approxPeriod"] = rng.random(size) < 0.1
+        df["house"] = df["Company"]
+
+        df[upstream_columns].to_csv(path, mode="w" if first == 0 else "a", header=first == 0, index=False, na_rep="NA")
+
+def _current_path(path: str) -> pd.DataFrame:
+    data = pd.read_csv(path)
+    data = convert_date(data)
+    data = drop_excess_columns(data)
+    return monthly_weighted_average(data)
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss carries over the parent's peak across exec on Linux, VmHWM does not
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Kilobytes on Linux, bytes on macOS
+    scale = 1024 ** 2 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def _run(path_name: str, polls_file: str, out: str) -> None:
+    # Memory held by the interpreter and imports, before reading
+    baseline = _peak_rss_mb()
+
+    start = time.perf_counter()
+    monthly = _current_path(polls_file) if path_name == "current" else read_monthly_polls(polls_file)
+    seconds = time.perf_counter() - start
+
+    peak = _peak_rss_mb()
+    monthly.to_pickle(out)
+    print(json.dumps({"seconds": seconds, "baseline_mb": baseline, "peak_mb": peak}))
+
+def _measure(path_name: str, polls_file: str, out: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run", path_name, "--polls-file", polls_file, "--out", out],
+        check=True, capture_output=True, text=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def _final(monthly: pd.DataFrame) -> str:
+    return normalize_percentages(linear_interpolation(monthly)).to_csv(index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reading the upstream poll file.")
+    parser.add_argument("--polls-file", help="local copy of Polls.csv (default: a synthetic file)")
+    parser.add_argument("--polls", type=int, default=3_000_000, help="polls in the synthetic file (default 3000000)")
+    parser.add_argument("--run", choices=["current", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        _run(args.run, args.polls_file, args.out)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        polls_file = args.polls_file
+        if polls_file is None:
+            polls_file = os.path.join(tmp, "Polls.csv")
+            synthetic_polls_file(polls_file, args.polls)
+
+        results = {}
+        monthly = {}
+        for path_name in ["current", "streaming"]:
+            out = os.path.join(tmp, f"{path_name}.pkl")
+            results[path_name] = _measure(path_name, polls_file, out)
+            monthly[path_name] = pd.read_pickle(out)
+
+        current, streaming = monthly["current"], monthly["streaming"]
+        # Sums are added up chunk by chunk, so the last bits may differ
+        pd.testing.assert_frame_equal(streaming, current, check_exact=False, rtol=1e-12)
+        difference = np.nanmax(np.abs(streaming[party_cols].to_numpy() - current[party_cols].to_numpy()))
+        identical = _final(streaming) == _final(current)
+
+        size = os.path.getsize(polls_file) / 1024 ** 2
+        print(f"File: {size:,.0f} MB, months: {len(current):,}")
+        print(f"Largest difference in monthly averages: {difference:.1e}, final output identical: {identical}")
+        for path_name, r in results.items():
+            print(f"{path_name:<10} {r['seconds']:6.2f} s, peak RSS {r['peak_mb']:7.0f} MB "
+                  f"({r['peak_mb'] - r['baseline_mb']:6.0f} MB above the interpreter)")
+
+if __name__ == "__main__":
+    main()
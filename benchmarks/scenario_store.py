@@ -0,0 +1,111 @@
+"""
+Latency of the scenario store with millions of saved scenarios.
+
+Fills a temporary store with random scenarios through the batched writer,
+then times repeat lookups, keyset pages deep into the list and fetching
+scenarios to compare.
+
+Run from the project root:
+
+    python benchmarks/scenario_store.py --rows 2000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from scenario_store import ScenarioStore, features
+from predict_sentiment import parties
+
+# Typical ranges, as in app.py
+ranges = {
+    "CPI": (250, 420),
+    "EC": (5000, 20000),
+    "GD": (1000000, 1300000),
+    "MSR": (-15, 20),
+    "MIR": (1, 6),
+    "Pop": (10300000, 10500000),
+    "UR": (5, 11),
+}
+
+def _percentiles(seconds: list) -> str:
+    ms = np.array(seconds) * 1000
+    return f"p50 {np.percentile(ms, 50):.3f} ms, p95 {np.percentile(ms, 95):.3f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scenario store.")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="scenarios to save (default 2000000)")
+    parser.add_argument("--versions", type=int, default=3, help="model versions the scenarios are spread over (default 3)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    versions = [f"version-{i}" for i in range(args.versions)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ScenarioStore(os.path.join(tmp, "scenarios.db"), batch_size=5000)
+
+        start = time.perf_counter()
+        scenarios = []
+        for first in range(0, args.rows, 100_000):
+            n = min(100_000, args.rows - first)
+            X = {f: np.round(rng.uniform(*ranges[f], n), 2) for f in features}
+            y = rng.uniform(0, 40, (n, len(parties)))
+            for i in range(n):
+                scenario = {f: X[f][i] for f in features}
+                version = versions[i % len(versions)]
+                store.add(version, scenario, dict(zip(parties, y[i])))
+                if i % 1000 == 0:
+                    scenarios.append((version, scenario))
+        queued = time.perf_counter() - start
+        store.flush()
+        written = time.perf_counter() - start
+        print(f"Saved {args.rows:,} scenarios: queued in {queued:.1f} s, written after {written:.1f} s")
+
+        hits = []
+        for version, scenario in scenarios[:2000]:
+            t = time.perf_counter()
+            assert store.get(version, scenario) is not None
+            hits.append(time.perf_counter() - t)
+
+        misses = []
+        for version, scenario in scenarios[:2000]:
+            t = time.perf_counter()
+            assert store.get(version, {**scenario, "UR": -1.0}) is None
+            misses.append(time.perf_counter() - t)
+
+        pages = []
+        before = None
+        for _ in range(500):
+            t = time.perf_counter()
+            page = store.page(before=before, limit=20)
+            pages.append(time.perf_counter() - t)
+            before = page[-1]["id"]
+
+        version_pages = []
+        before = None
+        for _ in range(500):
+            t = time.perf_counter()
+            page = store.page(before=before, limit=20, version=versions[-1])
+            version_pages.append(time.perf_counter() - t)
+            before = page[-1]["id"]
+
+        fetches = []
+        for _ in range(500):
+            ids = rng.integers(1, args.rows, 5).tolist()
+            t = time.perf_counter()
+            store.fetch(ids)
+            fetches.append(time.perf_counter() - t)
+
+        print(f"Repeat scenario lookup:   {_percentiles(hits)}")
+        print(f"New scenario lookup:      {_percentiles(misses)}")
+        print(f"Page of 20:               {_percentiles(pages)}")
+        print(f"Page of 20, one version:  {_percentiles(version_pages)}")
+        print(f"Fetch 5 to compare:       {_percentiles(fetches)}")
+
+if __name__ == "__main__":
+    main()
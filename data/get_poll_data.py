@@ -4,6 +4,27 @@ import numpy as np
 URL = "https://raw.githubusercontent.com/MansMeg/SwedishPolls/master/Data/Polls.csv"
 party_cols = ["M", "L", "C", "KD", "S", "V", "MP", "SD"]
 
+month_map = {
+    "jan": "01", "feb": "02", "mar": "03", "apr": "04",
+    "maj": "05", "jun": "06", "jul": "07", "aug": "08",
+    "sep": "09", "okt": "10", "nov": "11", "dec": "12"
+}
+
+def parse_year_month(values: pd.Series) -> np.ndarray:
+    """
+    Parse YYYY-mon strings into monthly period ordinals. Every distinct
+    string is parsed once and the result looked up for all rows. Values
+    that cannot be parsed become NaT.
+    """
+
+    codes, uniques = pd.factorize(values)
+
+    s = pd.Series(uniques).astype(str).str.strip().str.lower()
+    parsed = pd.PeriodIndex(s.str.slice(0, 4) + "-" + s.str.slice(5).map(month_map), freq="M")
+
+    # Missing values have code -1, which picks the NaT appended last
+    return np.append(parsed.asi8, pd.NaT.value)[codes]
+
 def convert_date(df: pd.DataFrame) -> pd.DataFrame:
     """
     Converts YearMonth column from YYYY-mon to YYYY-MM format
@@ -12,17 +33,9 @@ def convert_date(df: pd.DataFrame) -> pd.DataFrame:
     
     new_df = df.copy()
     
-    month_map = {
-        "jan": "01", "feb": "02", "mar": "03", "apr": "04",
-        "maj": "05", "jun": "06", "jul": "07", "aug": "08",
-        "sep": "09", "okt": "10", "nov": "11", "dec": "12"
-    }
-
-    s = new_df["PublYearMonth"].astype(str).str.strip().str.lower()
-    year = s.str.slice(0, 4)
-    month = s.str.slice(5).map(month_map)
+    ordinals = parse_year_month(new_df["PublYearMonth"])
     
-    new_df["PublYearMonth"] = pd.PeriodIndex(year + "-" + month, freq="M")
+    new_df["PublYearMonth"] = pd.PeriodIndex.from_ordinals(ordinals, freq="M")
     new_df = new_df.rename(columns={"PublYearMonth": "date"})
     
     return new_df
@@ -52,24 +65,26 @@ def monthly_weighted_average(df: pd.DataFrame) -> pd.DataFrame:
     global_mean_n = new_df["n"].mean()
 
     # Fill missing n per month with that month's mean n
-    new_df["n"] = new_df.groupby("date")["n"].transform(lambda s: s.fillna(s.mean()))
+    new_df["n"] = new_df["n"].fillna(new_df.groupby("date")["n"].transform("mean"))
     # If still missing use global mean
     new_df["n"] = new_df["n"].fillna(global_mean_n).astype(float)
 
-    # Weighted average per party within each month
-    out = pd.DataFrame(index=new_df.groupby("date").size().index)
-
-    for c in party_cols:
-        x = new_df[c]
-        w = new_df["n"]
-
-        # Use weights only where x exists; if x is NaN, weight = 0 
-        w_used = w.where(x.notna(), 0.0)
-
-        weighted_sum = (x.fillna(0.0) * w_used).groupby(new_df["date"]).sum()
-        weight_sum = w_used.groupby(new_df["date"]).sum()
-
-        out[c] = weighted_sum / weight_sum.replace(0, pd.NA)
+    # Use weights only where a party value exists; if x is NaN, weight = 0
+    x = new_df[party_cols].to_numpy(dtype=float)
+    exists = ~np.isnan(x)
+    w_used = np.where(exists, new_df[["n"]].to_numpy(), 0.0)
+
+    # Weighted sums and weight sums of all parties in one grouped reduction
+    stacked = pd.DataFrame(np.hstack([np.where(exists, x, 0.0) * w_used, w_used]), index=new_df.index)
+    sums = stacked.groupby(new_df["date"]).sum()
+    weighted_sum = sums.iloc[:, :len(party_cols)].to_numpy()
+    weight_sum = sums.iloc[:, len(party_cols):].to_numpy()
+
+    out = pd.DataFrame(
+        weighted_sum / np.where(weight_sum != 0, weight_sum, np.nan),
+        index=sums.index,
+        columns=party_cols
+    )
 
     # Include date column and sort newest measurement first
     out = out.sort_index(ascending=False)
@@ -77,6 +92,128 @@ def monthly_weighted_average(df: pd.DataFrame) -> pd.DataFrame:
     
     return out
 
+class MonthlyAccumulator:
+    """Monthly weighted averages built up from polls fed in chunks.
+
+    Gives the same averages as `monthly_weighted_average`, but keeps only
+    running sums per month, so memory does not grow with the number of
+    polls. Polls without a sample size get the mean sample size of their
+    month, which is only known once every poll has been seen, so their
+    party values are summed separately and weighted in `result`:
+
+        average = (sum x*n + mean_n * sum x) / (sum n + mean_n * count)
+
+    where the first terms are over polls with a sample size and the second
+    over polls without, counting only polls where the party has a value.
+    """
+
+    def __init__(self):
+        k = len(party_cols)
+        self._blocks = {
+            "xn": slice(0, k),             # sum x*n, polls with n
+            "n": slice(k, 2 * k),          # sum n, polls with n
+            "x": slice(2 * k, 3 * k),      # sum x, polls without n
+            "count": slice(3 * k, 4 * k),  # count, polls without n
+            "sum_n": 4 * k,                # sum n over all polls of the month
+            "count_n": 4 * k + 1,          # polls of the month with n
+        }
+        self.sums = pd.DataFrame(dtype=float)
+        # Sample sizes of all polls, including those without a month
+        self.total_n = 0.0
+        self.count_n = 0
+
+    def add(self, ordinals: np.ndarray, n: np.ndarray, x: np.ndarray) -> None:
+        """
+        Add polls given as month ordinals, sample sizes and a matrix of party
+        values in `party_cols` order. Polls without a month only count
+        towards the mean sample size used for months without any.
+        """
+
+        self.total_n += np.nansum(n)
+        self.count_n += int(np.count_nonzero(~np.isnan(n)))
+
+        known = ordinals != pd.NaT.value
+        n, x = n[known], x[known]
+
+        has_n = ~np.isnan(n)[:, None]
+        exists = ~np.isnan(x)
+        x0 = np.where(exists, x, 0.0)
+        n0 = np.where(has_n, n[:, None], 0.0)
+
+        contributions = np.hstack([
+            x0 * n0,
+            np.where(exists, n0, 0.0),
+            np.where(has_n, 0.0, x0),
+            (exists & ~has_n).astype(float),
+            n0[:, :1],
+            has_n.astype(float),
+        ])
+        chunk = pd.DataFrame(contributions).groupby(ordinals[known]).sum()
+
+        self.sums = self.sums.add(chunk, fill_value=0.0) if len(self.sums) else chunk
+
+    def result(self) -> pd.DataFrame:
+        """
+        Weighted average per party and month, newest month first, in the
+        format of `monthly_weighted_average`.
+        """
+
+        b = self._blocks
+        sums = self.sums.to_numpy()
+
+        # Mean sample size of each month, or over all polls for months without any
+        global_mean_n = self.total_n / self.count_n if self.count_n else np.nan
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_n = sums[:, b["sum_n"]] / sums[:, b["count_n"]]
+        mean_n = np.where(sums[:, b["count_n"]] > 0, mean_n, global_mean_n)[:, None]
+
+        weighted_sum = sums[:, b["xn"]] + mean_n * sums[:, b["x"]]
+        weight_sum = sums[:, b["n"]] + mean_n * sums[:, b["count"]]
+
+        out = pd.DataFrame(
+            weighted_sum / np.where(weight_sum != 0, weight_sum, np.nan),
+            index=pd.PeriodIndex.from_ordinals(self.sums.index.to_numpy(), freq="M").rename("date"),
+            columns=party_cols
+        )
+
+        # Include date column and sort newest measurement first
+        return out.sort_index(ascending=False).reset_index()
+
+def read_monthly_polls(source: str = URL, chunksize: int = 100_000) -> pd.DataFrame:
+    """Stream the upstream poll file into monthly weighted averages.
+
+    Only the publication month, the sample size and the party columns are
+    read, with explicit dtypes, `chunksize` rows at a time. Each chunk is
+    added to a `MonthlyAccumulator`, so memory stays constant no matter
+    how many polls the file holds.
+
+    Parameters
+    ----------
+    source : str, default URL
+        Path or URL of a Polls.csv file in the SwedishPolls format.
+    chunksize : int, default 100000
+        Number of rows parsed at a time.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The same monthly averages as reading the whole file and running
+        `convert_date`, `drop_excess_columns` and `monthly_weighted_average`.
+    """
+
+    dtypes = {"PublYearMonth": str, "n": "float64", **{c: "float64" for c in party_cols}}
+    accumulator = MonthlyAccumulator()
+
+    with pd.read_csv(source, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize) as reader:
+        for chunk in reader:
+            accumulator.add(
+                parse_year_month(chunk["PublYearMonth"]),
+                chunk["n"].to_numpy(),
+                chunk[party_cols].to_numpy(),
+            )
+
+    return accumulator.result()
+
 def linear_interpolation(df: pd.DataFrame) -> pd.DataFrame:
     """
     Fill missing values via linear interpolation per party column,
@@ -96,19 +233,9 @@ def linear_interpolation(df: pd.DataFrame) -> pd.DataFrame:
     new_df = new_df.reindex(full_range)
     new_df.index.name = "date"
 
-    # Interpolate each column, but only within existing data range
-    for col in party_cols:
-        s = new_df[col]
-
-        first = s.first_valid_index()
-        last = s.last_valid_index()
-
-
-        # Interpolate only in the middle range
-        s_mid = s.loc[first:last].interpolate(method="linear")
-
-        # Write back segment outside remains NaN
-        new_df.loc[first:last, col] = s_mid
+    # Interpolate all columns at once, only between each column's first and
+    # last existing value
+    new_df[party_cols] = new_df[party_cols].interpolate(method="linear", limit_area="inside")
 
     # Newest measure first again
     new_df = (
@@ -164,11 +291,7 @@ def normalize_percentages(df: pd.DataFrame) -> pd.DataFrame:
 
 if __name__ == "__main__":
     
-    data = pd.read_csv(URL)
-    
-    data = convert_date(data)
-    data = drop_excess_columns(data)
-    data = monthly_weighted_average(data)
+    data = read_monthly_polls(URL)
     data = linear_interpolation(data)
     data = normalize_percentages(data)
     
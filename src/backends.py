@@ -0,0 +1,169 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+
+class RidgeRegressor(RegressorMixin, BaseEstimator):
+    """Closed-form ridge regression on standardized features.
+
+    The penalty is applied to the coefficients of the standardized features,
+    but `coef_` and `intercept_` are stored on the original scale, so a
+    prediction is a single matrix multiply. Fits one or several targets at
+    once.
+
+    Parameters
+    ----------
+    alpha : float, default 1.0
+        Strength of the L2 penalty, 0 gives ordinary least squares.
+    """
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+
+    def fit(self, X, y):
+        if hasattr(X, "columns"):
+            self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.n_features_in_ = X.shape[1]
+
+        self.mean_ = X.mean(axis=0)
+        self.scale_ = X.std(axis=0)
+        self.scale_[self.scale_ == 0] = 1.0
+
+        Z = (X - self.mean_) / self.scale_
+        y_mean = y.mean(axis=0)
+
+        # Normal equations of the penalized least squares problem
+        A = Z.T @ Z + self.alpha * np.eye(self.n_features_in_)
+        w = np.linalg.solve(A, Z.T @ (y - y_mean))
+
+        self.coef_ = w / (self.scale_ if w.ndim == 1 else self.scale_[:, None])
+        self.intercept_ = y_mean - self.mean_ @ self.coef_
+
+        return self
+
+    def predict(self, X):
+        return np.asarray(X, dtype=float) @ self.coef_ + self.intercept_
+
+class ModelBackend:
+    """A kind of model the party models can be trained and served with.
+
+    Training fits one estimator per party from `make_estimator`, so that
+    parties can be refitted independently. Serving goes through
+    `predictor`, which may combine the eight party models into something
+    faster to evaluate.
+
+    Attributes
+    ----------
+    name : str
+        Identifier used on the command line and in the model manifest.
+    label : str
+        Human readable name.
+    file_prefix : str
+        Party models are saved as '<file_prefix>_<party>.joblib'.
+    defaults : dict
+        Default hyperparameters of the estimator.
+    """
+
+    name = None
+    label = None
+    file_prefix = None
+    defaults = {}
+
+    def __init__(self, **hyperparameters):
+        self.hyperparameters = {**self.defaults, **hyperparameters}
+
+    def make_estimator(self):
+        raise NotImplementedError
+
+    def predictor(self, models: dict, parties: list):
+        """Function predicting all parties for a DataFrame of scenarios.
+
+        Parameters
+        ----------
+        models : dict
+            Dictionary mapping party names to fitted estimators.
+        parties : list of str
+            Order of the prediction columns.
+
+        Returns
+        -------
+        predict : callable
+            Takes a DataFrame with the training feature columns and returns
+            an array of shape (n_rows, n_parties).
+        """
+
+        def predict(X: pd.DataFrame) -> np.ndarray:
+            return np.column_stack([models[party].predict(X) for party in parties])
+
+        return predict
+
+class RandomForestBackend(ModelBackend):
+    name = "random_forest"
+    label = "Random Forest"
+    file_prefix = "rf"
+    defaults = {"n_estimators": 100, "random_state": 42, "n_jobs": -1}
+
+    def make_estimator(self):
+        return RandomForestRegressor(**self.hyperparameters)
+
+class HistGradientBoostingBackend(ModelBackend):
+    name = "hist_gradient_boosting"
+    label = "Histogram Gradient Boosting"
+    file_prefix = "hgb"
+    defaults = {"max_iter": 300, "learning_rate": 0.05, "random_state": 42}
+
+    def make_estimator(self):
+        return HistGradientBoostingRegressor(**self.hyperparameters)
+
+class LinearBackend(ModelBackend):
+    name = "linear"
+    label = "Linear Regression (ridge)"
+    file_prefix = "lin"
+    defaults = {"alpha": 1.0}
+
+    def make_estimator(self):
+        return RidgeRegressor(**self.hyperparameters)
+
+    def predictor(self, models: dict, parties: list):
+        """
+        Stack the party coefficients, so that all parties are predicted
+        with one matrix multiply.
+        """
+
+        coef = np.column_stack([models[party].coef_ for party in parties])
+        intercept = np.array([models[party].intercept_ for party in parties])
+
+        def predict(X: pd.DataFrame) -> np.ndarray:
+            return np.asarray(X, dtype=float) @ coef + intercept
+
+        return predict
+
+backends = {
+    backend.name: backend
+    for backend in (RandomForestBackend, HistGradientBoostingBackend, LinearBackend)
+}
+
+DEFAULT_BACKEND = "random_forest"
+
+def get_backend(name: str = None) -> ModelBackend:
+    """Backend by name, by default the one chosen for this deployment.
+
+    The default is read from the SENTIMENT_BACKEND environment variable
+    and falls back to Random Forest.
+
+    Raises
+    ------
+    ValueError
+        If no backend has that name.
+    """
+
+    name = name or os.environ.get("SENTIMENT_BACKEND", DEFAULT_BACKEND)
+    if name not in backends:
+        raise ValueError(f"Unknown model backend '{name}', choose from: {', '.join(backends)}")
+
+    return backends[name]()
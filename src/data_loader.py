@@ -1,41 +1,50 @@
 import pandas as pd
-from functools import reduce
 
 parties = ["S", "M", "L", "C", "KD", "V", "MP", "SD"]
 
-def load_data(files: map) -> pd.DataFrame:
+def load_data(files: map, feature_dtype: str = "float32") -> pd.DataFrame:
     """Load and merge multiple CSV files into a single DataFrame, including party polling data.
 
+    Every file is read straight into its final dtype with the date as index,
+    and all of them are joined on the index in one step, so no intermediate
+    merged frames are kept alive. Features are stored compactly in
+    `feature_dtype`; the tree models compare features as float32 anyway.
+    Party polling columns stay float64 so the targets are exact.
+
     Parameters
     ----------
     files : dict
         Dictionary mapping feature names to their corresponding CSV filenames.
+    feature_dtype : str, default "float32"
+        Dtype of the feature columns.
 
     Returns
     -------
     df : pandas.DataFrame
         Merged DataFrame containing all features and party polling columns, 
-        with rows before September 2006 removed and the 'date' column dropped.
+        indexed by month ('YYYY-MM'), with rows before September 2006 removed.
     """
-    
-    dfs = []
-    
-    for col_name, file in files.items():
-        df = pd.read_csv(f'data/raw_data/{file}')
-        
-        dfs.append(df)
-
-    df = reduce(
-        lambda left, right: pd.merge(left, right, on="date", how="inner"),
-        dfs
+
+    features = [
+        pd.read_csv(
+            f'data/raw_data/{file}',
+            usecols=["date", col_name],
+            index_col="date",
+            dtype={"date": str, col_name: feature_dtype},
+        )
+        for col_name, file in files.items()
+    ]
+    sentiment = pd.read_csv(
+        'data/raw_data/polls.csv',
+        index_col="date",
+        dtype={"date": str, **{party: "float64" for party in parties}},
     )
 
-    sentiment = pd.read_csv('data/raw_data/polls.csv')
-    df = df.merge(sentiment, on='date', how='inner')
-    
-    df = df[df['date'] >= '2006-09']
+    # Inner join on the date, in the row order of the first file
+    df = pd.concat(features + [sentiment], axis=1, join="inner")
+    del features, sentiment
 
-    df = df.drop('date', axis =1)
+    df = df[df.index >= '2006-09']
     
     return df
 
@@ -0,0 +1,245 @@
+from functools import lru_cache
+from math import factorial
+
+import numpy as np
+import pandas as pd
+
+from predict_sentiment import parties, current_generation, register_derived
+from backends import RandomForestBackend, LinearBackend
+
+def _leaf_paths(tree, generation) -> tuple:
+    """Describe every root-to-leaf path of a fitted decision tree.
+
+    For each leaf and model feature, the path constrains the feature to the
+    interval (low, high], exactly as the tree compares it. Every model
+    feature is computed from one metric, so the splits on a metric and its
+    lags, rolling means and delta form one player: the cover ratio is the
+    share of training samples that follow the path through all of them,
+    1 for metrics the path does not split on.
+
+    Returns
+    -------
+    low, high : numpy.ndarray
+        Arrays of shape (n_leaves, n_model_features).
+    cover : numpy.ndarray
+        Array of shape (n_leaves, n_metrics).
+    value : numpy.ndarray
+        Prediction of each leaf, shape (n_leaves,).
+    """
+
+    t = tree.tree_
+    n_nodes = t.node_count
+
+    low = np.full((n_nodes, len(generation.model_features)), -np.inf)
+    high = np.full((n_nodes, len(generation.model_features)), np.inf)
+    cover = np.ones((n_nodes, len(generation.features)))
+
+    # Children always have larger ids than their parent, walk level by level
+    frontier = np.array([0])
+    while len(frontier) > 0:
+        frontier = frontier[t.children_left[frontier] >= 0]
+        f = t.feature[frontier]
+        threshold = t.threshold[frontier]
+        metric = generation.source[f]
+        w = t.weighted_n_node_samples
+
+        for child, side in ((t.children_left[frontier], "left"), (t.children_right[frontier], "right")):
+            low[child] = low[frontier]
+            high[child] = high[frontier]
+            cover[child] = cover[frontier]
+            if side == "left":
+                high[child, f] = np.minimum(high[frontier, f], threshold)
+            else:
+                low[child, f] = np.maximum(low[frontier, f], threshold)
+            cover[child, metric] *= w[child] / w[frontier]
+
+        frontier = np.concatenate([t.children_left[frontier], t.children_right[frontier]])
+
+    leaves = t.children_left < 0
+
+    return low[leaves], high[leaves], cover[leaves], t.value[leaves, 0, 0]
+
+def _forest_paths(generation) -> tuple:
+    """
+    Stack the leaf paths of all trees of all party forests. Leaf values are
+    divided by the number of trees, since a forest averages its trees.
+    """
+
+    low, high, cover, value, party_start, base = [], [], [], [], [], []
+    n_leaves = 0
+
+    for party in parties:
+        model = generation.models[party]
+        party_start.append(n_leaves)
+        base.append(np.mean([tree.tree_.value[0, 0, 0] for tree in model.estimators_]))
+
+        for tree in model.estimators_:
+            l, h, c, v = _leaf_paths(tree, generation)
+            low.append(l)
+            high.append(h)
+            cover.append(c)
+            value.append(v / len(model.estimators_))
+            n_leaves += len(v)
+
+    # Stored feature-major, so each feature is a contiguous vector over leaves
+    return (np.ascontiguousarray(np.vstack(low).T), np.ascontiguousarray(np.vstack(high).T),
+            np.ascontiguousarray(np.vstack(cover).T), np.concatenate(value),
+            generation.source, np.array(party_start), pd.Series(base, index=parties))
+
+def _attributions(x: np.ndarray, paths: tuple) -> np.ndarray:
+    """Exact path-dependent TreeSHAP values of a single scenario.
+
+    `x` holds the model features of the scenario, as from
+    `ModelGeneration.expand`. For every leaf, a metric is "one" if the
+    scenario satisfies all splits on the metric and its derived features
+    along the path, and otherwise follows it with the cover ratio. The
+    Shapley value of metric i from a leaf is
+
+        value * (one_i - cover_i) * sum_S w(|S|) prod_{j in S} one_j prod_{j not in S} cover_j
+
+    over subsets S of the other metrics. The sum is the weighted
+    coefficients of the polynomial prod_{j != i} (cover_j + one_j * t),
+    obtained by dividing the product over all metrics by the factor of
+    metric i. Metrics a path does not split on have one = cover = 1 and
+    drop out of the sum. All leaves of all trees are handled at once.
+
+    Returns
+    -------
+    phi : numpy.ndarray
+        Attributions of shape (n_parties, n_metrics).
+    """
+
+    low, high, cover, value, source, party_start, _ = paths
+
+    # Shapley weight of a coalition of size k among all metrics
+    n = len(cover)
+    weights = np.array([factorial(k) * factorial(n - k - 1) / factorial(n) for k in range(n)])
+
+    # Trees compare feature values as float32
+    x = x.astype(np.float32).astype(float)[:, None]
+    inside = (x > low) & (x <= high)
+
+    one = np.ones(cover.shape, dtype=bool)
+    for j, metric in enumerate(source):
+        one[metric] &= inside[j]
+    one = one.astype(float)
+
+    # Coefficients of prod_j (cover_j + one_j * t), lowest degree first
+    full = [np.ones(len(value))]
+    for j in range(n):
+        full = (
+            [cover[j] * full[0]]
+            + [cover[j] * full[k] + one[j] * full[k - 1] for k in range(1, len(full))]
+            + [one[j] * full[-1]]
+        )
+
+    phi = np.empty((n, len(value)))
+
+    for i in range(n):
+        z = cover[i]
+
+        # Divide out (z + t) from the top coefficient down
+        q = full[n]
+        total_one = weights[n - 1] * q
+        for k in range(n - 1, 0, -1):
+            q = full[k] - z * q
+            total_one += weights[k - 1] * q
+
+        # Divide out the constant z
+        total_zero = sum(weights[k] * full[k] for k in range(n)) / z
+
+        total = np.where(one[i] > 0, total_one, total_zero)
+        phi[i] = value * (one[i] - z) * total
+
+    return np.add.reduceat(phi, party_start, axis=1).T
+
+def _linear_attributions(generation) -> tuple:
+    """
+    Exact Shapley values of a linear model with independent features are
+    the coefficient times the deviation from the training mean.
+    """
+
+    models = generation.models
+    coef = np.vstack([models[party].coef_ for party in parties])
+    mean = np.vstack([models[party].mean_ for party in parties])
+    base = pd.Series([models[party].predict(models[party].mean_[None, :])[0] for party in parties], index=parties)
+
+    # Derived features are credited to the metric they are computed from
+    groups = np.zeros((len(generation.model_features), len(generation.features)))
+    groups[np.arange(len(generation.model_features)), generation.source] = 1
+
+    def attributions(x: np.ndarray) -> np.ndarray:
+        return (coef * (generation.expand(x[None, :]).to_numpy()[0] - mean)) @ groups
+
+    return attributions, base
+
+def _explainer(generation):
+    """
+    Cached explanation function for one generation of models, so that
+    cached results are dropped together with the models they came from.
+    None if the backend cannot be explained.
+    """
+
+    if isinstance(generation.backend, RandomForestBackend):
+        paths = _forest_paths(generation)
+        base = paths[-1]
+
+        def attributions(x: np.ndarray) -> np.ndarray:
+            # Splits are decided on the model features, as in prediction
+            return _attributions(generation.expand(x[None, :]).to_numpy()[0], paths)
+    elif isinstance(generation.backend, LinearBackend):
+        attributions, base = _linear_attributions(generation)
+    else:
+        return None
+
+    @lru_cache(maxsize=1024)
+    def explain(x: tuple) -> pd.DataFrame:
+        phi = attributions(np.array(x))
+
+        explanation = pd.DataFrame(phi, index=parties, columns=generation.features)
+        explanation.insert(0, "base", base)
+
+        return explanation
+
+    return explain
+
+# Precomputed once per generation of models
+register_derived("explainer", _explainer)
+
+def explain_sentiment(user_input: dict) -> pd.DataFrame:
+    """Feature contributions to the predicted polling percentage of each party.
+
+    Attributions are exact Shapley values of the Random Forest predictions
+    (path-dependent TreeSHAP), or of the linear model relative to the
+    training mean. Results are cached, so repeated scenarios are free.
+    For models trained with derived features, a metric and its lags,
+    rolling means and delta are one player, so TreeSHAP still runs over
+    the seven metrics only.
+
+    Parameters
+    ----------
+    user_input : dict
+        Dictionary containing feature values for prediction,
+        where keys match the columns used for training.
+
+    Returns
+    -------
+    explanation : pandas.DataFrame
+        One row per party. The 'base' column holds the average prediction
+        over the training data and the remaining columns the contribution
+        of each feature. Each row sums to the party's prediction.
+
+    Raises
+    ------
+    ValueError
+        If the current model backend does not support explanations.
+    """
+
+    generation = current_generation()
+    explainer = generation.derived["explainer"]
+    if explainer is None:
+        raise ValueError(f"Explanations are not available for {generation.backend.label} models")
+
+    x = tuple(float(user_input[feature]) for feature in generation.features)
+
+    return explainer(x).copy()
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Derived features of each source series are cached here between runs
+CACHE_DIR = os.path.join("data", "feature_cache")
+
+class FeatureConfig:
+    """Derived features computed from the monthly history of every metric.
+
+    Parameters
+    ----------
+    lags : tuple of int, default ()
+        Add the value from this many months before, as '<name>_lag<k>'.
+    rolling : tuple of int, default ()
+        Add the mean over this many months up to and including the current
+        one, as '<name>_mean<w>'.
+    delta : bool, default False
+        Add the change from the previous month, as '<name>_delta'.
+    """
+
+    def __init__(self, lags: tuple = (), rolling: tuple = (), delta: bool = False):
+        self.lags = tuple(sorted(set(int(k) for k in lags)))
+        self.rolling = tuple(sorted(set(int(w) for w in rolling)))
+        self.delta = bool(delta)
+
+        if any(k < 1 for k in self.lags) or any(w < 2 for w in self.rolling):
+            raise ValueError("Lags must be at least 1 month and rolling windows at least 2 months")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.lags or self.rolling or self.delta)
+
+    @property
+    def lookback(self) -> int:
+        """
+        Months of history before the current one that the features need.
+        """
+
+        return max(self.lags + tuple(w - 1 for w in self.rolling) + ((1,) if self.delta else ()), default=0)
+
+    def columns(self, name: str) -> list:
+        """
+        Names of the derived features of one metric, in the order they are added.
+        """
+
+        return (
+            [f"{name}_lag{k}" for k in self.lags]
+            + [f"{name}_mean{w}" for w in self.rolling]
+            + ([f"{name}_delta"] if self.delta else [])
+        )
+
+    def to_dict(self) -> dict:
+        return {"lags": list(self.lags), "rolling": list(self.rolling), "delta": self.delta}
+
+def monthly_series(file: str, name: str) -> pd.Series:
+    """
+    A metric from its raw CSV file, oldest month first, on a gapless monthly
+    index so that shifting by k rows is a lag of k months. Months without a
+    value are NaN.
+    """
+
+    s = pd.read_csv(f'data/raw_data/{file}', usecols=["date", name], index_col="date")[name]
+    s.index = pd.PeriodIndex(s.index, freq="M")
+    s = s.sort_index()
+
+    return s.reindex(pd.period_range(s.index[0], s.index[-1], freq="M")).astype(float)
+
+def derive(s: pd.Series, config: FeatureConfig, start: int = 0) -> pd.DataFrame:
+    """Derived features of a monthly series, for the months from position `start` on.
+
+    Every value is computed from its own window of the series, so computing
+    only the new months of a longer series gives the same values as
+    computing all of them.
+
+    Returns
+    -------
+    derived : pandas.DataFrame
+        One column per derived feature, indexed by the months `s.index[start:]`.
+    """
+
+    values = s.to_numpy()
+    n = len(values)
+    rows = np.arange(start, n)
+    out = {}
+
+    # Values before the start of the series are missing
+    padded = np.concatenate([np.full(config.lookback, np.nan), values])
+    shifted = rows + config.lookback
+
+    for k in config.lags:
+        out[f"{s.name}_lag{k}"] = padded[shifted - k]
+    for w in config.rolling:
+        windows = np.lib.stride_tricks.sliding_window_view(padded, w)
+        out[f"{s.name}_mean{w}"] = windows[shifted - w + 1].mean(axis=1)
+    if config.delta:
+        out[f"{s.name}_delta"] = padded[shifted] - padded[shifted - 1]
+
+    return pd.DataFrame(out, index=s.index[start:], columns=config.columns(s.name))
+
+def _cache_path(name: str, config: FeatureConfig, cache_dir: str) -> str:
+    key = hashlib.sha256(json.dumps(config.to_dict(), sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{name}-{key}.pkl")
+
+def series_features(s: pd.Series, config: FeatureConfig, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """Derived features of a monthly series, reusing the previous run.
+
+    The series and its derived features are cached per metric and
+    configuration. If the cached series is unchanged up to its last month,
+    only the months appended since are computed; otherwise, for example
+    after SCB revised old values, everything is computed again.
+    """
+
+    path = _cache_path(s.name, config, cache_dir)
+    try:
+        cached = pd.read_pickle(path)
+    except (FileNotFoundError, EOFError):
+        cached = None
+
+    start = 0
+    if cached is not None:
+        old_series, old_derived = cached["series"], cached["derived"]
+        n = len(old_series)
+        if n <= len(s) and s.index[:n].equals(old_series.index) and np.array_equal(
+            s.to_numpy()[:n], old_series.to_numpy(), equal_nan=True
+        ):
+            start = n
+            if start == len(s):
+                return old_derived
+
+    derived = derive(s, config, start)
+    if start > 0:
+        derived = pd.concat([old_derived, derived])
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    pd.to_pickle({"series": s, "derived": derived}, tmp)
+    os.replace(tmp, path)
+
+    return derived
+
+def add_features(df: pd.DataFrame, files: dict, config: FeatureConfig) -> tuple:
+    """Add the derived features of every metric to the merged dataset.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Dataset from `data_loader.load_data`, indexed by month.
+    files : dict
+        Dictionary mapping feature names to their corresponding CSV filenames.
+    config : FeatureConfig
+        Derived features to add.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The dataset with the derived feature columns after the original
+        ones. Months where a derived feature is missing are dropped.
+    pipeline : FeaturePipeline or None
+        What serving needs to compute the same features for a new month,
+        None if `config` adds no features.
+    """
+
+    if not config.enabled:
+        return df, None
+
+    derived = []
+    history = {}
+
+    for name, file in files.items():
+        s = monthly_series(file, name)
+        d = series_features(s, config)
+        d.index = d.index.astype(str)
+        derived.append(d.astype(df[name].dtype))
+        history[name] = s.to_numpy()[len(s) - config.lookback:].tolist()
+
+    df = df.join(pd.concat(derived, axis=1), how="left")
+
+    incomplete = df.isna().any(axis=1)
+    if incomplete.any():
+        print(f"Dropped {int(incomplete.sum())} months without enough history for the derived features")
+        df = df[~incomplete]
+
+    return df, FeaturePipeline(config, history)
+
+class FeaturePipeline:
+    """Derived features for a scenario of current metric values.
+
+    A scenario is taken to be the month after the last month of each
+    metric's history, so every derived feature is an affine function of the
+    current value of its metric: a lag is a constant from the history, a
+    rolling mean is `x / w` plus the mean of the previous months, and a
+    delta is `x` minus the last month. Serving only needs the last
+    `config.lookback` months of each metric, which are saved in the model
+    manifest.
+
+    Parameters
+    ----------
+    config : FeatureConfig
+        Derived features the models were trained with.
+    history : dict
+        Dictionary mapping each metric name to its last `config.lookback`
+        monthly values, oldest first.
+    """
+
+    def __init__(self, config: FeatureConfig, history: dict):
+        self.config = config
+        self.history = {name: np.asarray(values, dtype=float) for name, values in history.items()}
+        self.inputs = list(history)
+
+    def to_dict(self) -> dict:
+        return {**self.config.to_dict(), "history": {name: h.tolist() for name, h in self.history.items()}}
+
+    @classmethod
+    def from_manifest(cls, manifest: dict):
+        """
+        The pipeline saved in a model manifest, None for models trained
+        without derived features.
+        """
+
+        saved = manifest.get("feature_pipeline")
+        if not saved:
+            return None
+
+        config = FeatureConfig(saved["lags"], saved["rolling"], saved["delta"])
+        return cls(config, saved["history"])
+
+    def affine(self, model_features: list) -> tuple:
+        """How each model feature follows from the current metric values.
+
+        Returns
+        -------
+        source, slope, offset : numpy.ndarray
+            For every model feature, the index of its metric in `inputs`,
+            and the slope and offset such that
+            `feature = slope * value + offset`.
+        """
+
+        terms = {}
+        for i, name in enumerate(self.inputs):
+            h = self.history[name]
+            terms[name] = (i, 1.0, 0.0)
+            for k in self.config.lags:
+                terms[f"{name}_lag{k}"] = (i, 0.0, h[len(h) - k])
+            for w in self.config.rolling:
+                terms[f"{name}_mean{w}"] = (i, 1.0 / w, h[len(h) - w + 1:].sum() / w)
+            if self.config.delta:
+                terms[f"{name}_delta"] = (i, 1.0, -h[-1])
+
+        source, slope, offset = zip(*(terms[feature] for feature in model_features))
+
+        return np.array(source), np.array(slope), np.array(offset)
@@ -0,0 +1,351 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from predict_sentiment import parties, current_generation, register_derived
+from sensitivity import default_range
+
+# Grids are built by `python src/lookup_grid.py` and cached here, one per
+# model version, outside of the immutable registry versions
+CACHE_DIR = os.path.join("data", "lookup_grid_cache")
+
+# Serving mode of this deployment, "exact" or "lookup"
+serving_mode = os.environ.get("SENTIMENT_SERVING", "exact")
+
+# Largest error against the exact models, in percentage points, a grid may
+# have to be served
+tolerance = float(os.environ.get("SENTIMENT_LOOKUP_TOLERANCE", "1.0"))
+
+class LookupGrid:
+    """Party predictions precomputed on a grid over the feature domain.
+
+    Each feature is cut at a set of boundaries, and every cell of the
+    resulting grid holds the predictions at one point inside it. With all
+    split thresholds of the forests as boundaries the predictions are
+    constant within a cell, so the grid is exact; compressed grids keep the
+    most used thresholds and are approximate.
+
+    Attributes
+    ----------
+    boundaries : list of numpy.ndarray
+        Sorted cell boundaries of each feature, in training column order.
+    low, high : numpy.ndarray
+        Range of each feature covered by the grid.
+    values : numpy.ndarray
+        Memory-mapped predictions of shape (n_cells, n_parties).
+    info : dict
+        Build report: grid shape, number of cells and errors against the
+        exact models.
+    """
+
+    def __init__(self, boundaries: list, low: np.ndarray, high: np.ndarray, values: np.ndarray, info: dict):
+        self.boundaries = boundaries
+        self.low = low
+        self.high = high
+        self.values = values
+        self.info = info
+        self.shape = tuple(len(b) + 1 for b in boundaries)
+
+    def cells(self, X: np.ndarray) -> np.ndarray:
+        """
+        Flat cell index of each row of X. Like the trees, a value equal to a
+        boundary belongs to the cell below it.
+        """
+
+        X = np.atleast_2d(X).astype(np.float32).astype(float)
+        index = [np.searchsorted(b, X[:, j], side="left") for j, b in enumerate(self.boundaries)]
+
+        return np.ravel_multi_index(index, self.shape)
+
+    def covers(self, X: np.ndarray) -> np.ndarray:
+        X = np.atleast_2d(X)
+        return np.all((X >= self.low) & (X <= self.high), axis=1)
+
+    def lookup(self, x: np.ndarray):
+        """Predictions of all parties for a single scenario.
+
+        Returns
+        -------
+        values : numpy.ndarray or None
+            One value per party, None if the scenario is outside the grid.
+        """
+
+        if not self.covers(x)[0]:
+            return None
+
+        return self.values[self.cells(x)[0]]
+
+def _split_weights(generation) -> list:
+    """
+    For each feature, the sorted unique split thresholds and the reduction
+    in squared error of the splits on them, summed over all trees.
+    """
+
+    n_features = len(generation.features)
+    thresholds = [[] for _ in range(n_features)]
+    weights = [[] for _ in range(n_features)]
+
+    for model in generation.models.values():
+        for tree in model.estimators_:
+            t = tree.tree_
+            n = t.weighted_n_node_samples
+            internal = t.children_left >= 0
+            left, right = t.children_left[internal], t.children_right[internal]
+
+            # Reduction in squared error achieved by each split
+            gain = np.zeros(t.node_count)
+            gain[internal] = (n[internal] * t.impurity[internal]
+                              - n[left] * t.impurity[left] - n[right] * t.impurity[right])
+
+            for j in range(len(generation.model_features)):
+                # Derived features split where their metric crosses the mapped threshold
+                source, slope, offset = generation.source[j], generation.slope[j], generation.offset[j]
+                if slope == 0:
+                    continue
+                split = t.feature == j
+                thresholds[source].append((t.threshold[split] - offset) / slope)
+                weights[source].append(gain[split])
+
+    result = []
+    for j in range(n_features):
+        unique, inverse = np.unique(np.concatenate(thresholds[j]), return_inverse=True)
+        result.append((unique, np.bincount(inverse, weights=np.concatenate(weights[j]))))
+
+    return result
+
+def choose_boundaries(generation, max_cells: int, min_boundaries: int = 0) -> list:
+    """Cell boundaries of each feature, at most `max_cells` cells in total.
+
+    Random Forests use their own split thresholds. While the grid is too
+    large, the threshold with the smallest error reduction per grid cell it
+    adds is dropped, but every feature keeps at least `min_boundaries` of
+    them (or all it has, if fewer) so that no metric stops affecting the
+    predictions. Other backends get evenly spaced boundaries.
+    """
+
+    n_features = len(generation.features)
+
+    if generation.derived["thresholds"] is None:
+        per_feature = max(int(max_cells ** (1 / n_features)) - 1, 1)
+        boundaries = []
+        for feature in generation.features:
+            low, high = default_range(feature, generation=generation)
+            boundaries.append(np.linspace(low, high, per_feature + 2)[1:-1])
+        return boundaries
+
+    splits = _split_weights(generation)
+    order = [np.argsort(weights, kind="stable") for _, weights in splits]
+    counts = [len(thresholds) for thresholds, _ in splits]
+    floors = [min(min_boundaries, c) for c in counts]
+    log_cells = sum(np.log(c + 1) for c in counts)
+    if sum(np.log(f + 1) for f in floors) > np.log(max_cells):
+        raise ValueError(f"{min_boundaries} boundaries per feature need more than {max_cells:,} cells")
+
+    # Drop the threshold that reduces the error least per grid cell
+    while log_cells > np.log(max_cells):
+        costs = [
+            splits[j][1][order[j][len(order[j]) - c]] / np.log((c + 1) / c) if c > floors[j] else np.inf
+            for j, c in enumerate(counts)
+        ]
+        j = int(np.argmin(costs))
+        log_cells -= np.log((counts[j] + 1) / counts[j])
+        counts[j] -= 1
+
+    boundaries = []
+    for (thresholds, _), kept, c in zip(splits, order, counts):
+        boundaries.append(np.sort(thresholds[kept[len(kept) - c:]]))
+
+    return boundaries
+
+def _representatives(boundaries: np.ndarray, low: float, high: float) -> np.ndarray:
+    """
+    One float32 point inside each cell of a feature, the midpoint where
+    possible, so that the trees route it into that cell.
+    """
+
+    edges = np.concatenate([[low], boundaries, [high]])
+    points = ((edges[:-1] + edges[1:]) / 2).astype(np.float32)
+
+    # Interior cells are (b[k-1], b[k]], nudge rounded midpoints back inside
+    upper = edges[1:-1]
+    above = points[:-1] > upper
+    points[:-1][above] = np.nextafter(upper[above].astype(np.float32), np.float32(-np.inf))
+    below = points[1:] <= upper
+    points[1:][below] = np.nextafter(upper[below].astype(np.float32), np.float32(np.inf))
+
+    return points.astype(float)
+
+def _cache_path(generation, cache_dir: str) -> str:
+    """
+    Path of a generation's grid, without extension. The '.npy' file holds
+    the predictions and the '.json' file the build report.
+    """
+
+    key = hashlib.sha256(str(generation.signature).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"grid-{key}")
+
+def build_grid(generation, max_cells: int = 2_000_000, min_boundaries: int = 2,
+               n_samples: int = 20_000, chunksize: int = 100_000, cache_dir: str = CACHE_DIR) -> LookupGrid:
+    """Evaluate the party models on every cell of a grid and save it.
+
+    The grid and its report are saved even if its error is above the
+    tolerance, so that serving knows not to use it.
+
+    Parameters
+    ----------
+    generation : ModelGeneration
+        Models to precompute.
+    max_cells : int, default 2000000
+        Upper limit on the number of grid cells.
+    min_boundaries : int, default 2
+        Boundaries every feature keeps, see `choose_boundaries`.
+    n_samples : int, default 20000
+        Random scenarios used to measure the error against the exact models.
+    chunksize : int, default 100000
+        Number of cells predicted at a time.
+    cache_dir : str, default "data/lookup_grid_cache"
+        Directory the grid is saved in.
+
+    Returns
+    -------
+    grid : LookupGrid
+        The grid, memory-mapped from its file.
+    """
+
+    features = generation.features
+    boundaries = choose_boundaries(generation, max_cells, min_boundaries)
+    ranges = [default_range(feature, generation=generation) for feature in features]
+    low = np.array([r[0] for r in ranges])
+    high = np.array([r[1] for r in ranges])
+
+    points = [_representatives(b, l, h) for b, l, h in zip(boundaries, low, high)]
+    shape = tuple(len(p) for p in points)
+    n_cells = int(np.prod(shape))
+
+    path = _cache_path(generation, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.npy.tmp-{os.getpid()}"
+    values = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(n_cells, len(parties)))
+
+    start = time.perf_counter()
+    for first in range(0, n_cells, chunksize):
+        index = np.unravel_index(np.arange(first, min(first + chunksize, n_cells)), shape)
+        X = pd.DataFrame({feature: points[j][index[j]] for j, feature in enumerate(features)})
+        values[first:first + len(X)] = generation.predict(X)
+    values.flush()
+    del values
+    os.replace(tmp, f"{path}.npy")
+    build_seconds = time.perf_counter() - start
+
+    values = np.load(f"{path}.npy", mmap_mode="r")
+    grid = LookupGrid(boundaries, low, high, values, {})
+
+    # Error against the exact models on random scenarios inside the grid
+    rng = np.random.default_rng(42)
+    X = pd.DataFrame({feature: rng.uniform(low[j], high[j], n_samples) for j, feature in enumerate(features)})
+    error = np.abs(values[grid.cells(X.to_numpy())] - generation.predict(X))
+
+    grid.info = {
+        "signature": str(generation.signature),
+        "features": features,
+        "parties": parties,
+        "shape": list(shape),
+        "cells": n_cells,
+        "size_mb": n_cells * len(parties) * 4 / 2**20,
+        "build_seconds": build_seconds,
+        "max_error": float(error.max()),
+        "mean_error": float(error.mean()),
+        "max_error_per_party": dict(zip(parties, error.max(axis=0).astype(float))),
+        "boundaries": [b.tolist() for b in boundaries],
+        "low": low.tolist(),
+        "high": high.tolist(),
+    }
+
+    # The report is replaced last, so it always describes the grid file
+    tmp = f"{path}.json.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(grid.info, f, indent=2)
+    os.replace(tmp, f"{path}.json")
+
+    return grid
+
+def load_grid(generation, cache_dir: str = CACHE_DIR):
+    """
+    The saved grid of a generation, None if it has not been built.
+    """
+
+    path = _cache_path(generation, cache_dir)
+    try:
+        with open(f"{path}.json", encoding="utf-8") as f:
+            info = json.load(f)
+        values = np.load(f"{path}.npy", mmap_mode="r")
+    except FileNotFoundError:
+        return None
+
+    if info["signature"] != str(generation.signature) or values.shape != (info["cells"], len(parties)):
+        return None
+
+    boundaries = [np.array(b) for b in info["boundaries"]]
+
+    return LookupGrid(boundaries, np.array(info["low"]), np.array(info["high"]), values, info)
+
+def _grid_for_serving(generation):
+    """
+    The saved grid of a generation. None if it has not been built or its
+    error against the exact models is above `tolerance`, so that the exact
+    models are served instead. Grids are never built here, as this runs at
+    startup and on every model reload.
+    """
+
+    grid = load_grid(generation)
+    if grid is None:
+        print("No lookup grid for the current models, run `python src/lookup_grid.py` to build it. "
+              "Serving exact predictions instead.")
+        return None
+
+    if grid.info["max_error"] > tolerance:
+        print(f"Lookup grid is off by up to {grid.info['max_error']:.2f} percentage points, more than the "
+              f"tolerance of {tolerance:g}. Serving exact predictions instead.")
+        return None
+
+    return grid
+
+def enable() -> None:
+    """
+    Serve predictions from the saved grid of every model version, from now
+    on and after each reload.
+    """
+
+    register_derived("lookup_grid", _grid_for_serving)
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the current models on a lookup grid.")
+    parser.add_argument("--max-cells", type=int, default=2_000_000, help="upper limit on grid cells (default 2000000)")
+    parser.add_argument("--min-boundaries", type=int, default=2, help="boundaries every metric keeps (default 2)")
+    args = parser.parse_args()
+
+    try:
+        grid = build_grid(current_generation(), max_cells=args.max_cells, min_boundaries=args.min_boundaries)
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    info = grid.info
+
+    print(f"Grid shape {' x '.join(map(str, info['shape']))} = {info['cells']:,} cells "
+          f"({info['size_mb']:.1f} MB), built in {info['build_seconds']:.1f} s")
+    print(f"Max error against the exact models: {info['max_error']:.3f} "
+          f"(mean {info['mean_error']:.4f}) percentage points")
+    for party, error in info["max_error_per_party"].items():
+        print(f"  {party}: {error:.3f}")
+
+    if info["max_error"] > tolerance:
+        sys.exit(f"Error: the max error is above the tolerance of {tolerance:g} percentage points, so lookup "
+                 "serving will use the exact models. Allow more cells or set SENTIMENT_LOOKUP_TOLERANCE.")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
+import argparse
+
 from data_loader import load_data, get_X
-from train_models import train_party_model
+from train_models import train_party_model, report_peak_rss
+from model_registry import current_version, collect_garbage
+from backends import backends, get_backend
+from features import FeatureConfig, add_features
 
 parties = ["S", "M", "L", "C", "KD", "V", "MP", "SD"]
 
+# Number of model versions kept in models/versions/
+keep_versions = 3
+
 files = {
     'CPI': 'consumer_price_index.csv',
     'EC': 'electricity_consumption.csv',
@@ -13,12 +21,40 @@ files = {
     'UR': 'unemployment_rate.csv'
     }
 
+def _months(value: str) -> tuple:
+    """
+    Comma separated numbers of months, e.g. '1,3,12'.
+    """
+
+    return tuple(int(v) for v in value.split(",") if v)
+
 def main():
+    parser = argparse.ArgumentParser(description="Train one model per party and save them as a new version.")
+    parser.add_argument("--force", action="store_true", help="refit all parties, even those whose data did not change")
+    parser.add_argument("--backend", choices=list(backends), help="model backend, SENTIMENT_BACKEND or random_forest by default")
+    parser.add_argument("--lags", type=_months, default=(), help="add each metric's value from these months before, e.g. 1,3,12")
+    parser.add_argument("--rolling", type=_months, default=(), help="add each metric's mean over these numbers of months, e.g. 3,12")
+    parser.add_argument("--delta", action="store_true", help="add each metric's change from the previous month")
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend)
+    config = FeatureConfig(args.lags, args.rolling, args.delta)
+
     df = load_data(files)
+    report_peak_rss("loading data")
+    df, pipeline = add_features(df, files, config)
+    if pipeline is not None:
+        report_peak_rss("derived features")
     X = get_X(df)
 
-    models = train_party_model(df, X, parties)
-    print("Models trained and saved!")
+    previous = current_version()
+    models = train_party_model(df, X, parties, force=args.force, backend=backend, pipeline=pipeline)
+    if current_version() != previous:
+        print(f"{backend.label} models trained and saved as version {current_version()}!")
+
+    removed = collect_garbage(keep=keep_versions)
+    if removed:
+        print(f"Removed old model versions: {', '.join(removed)}")
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
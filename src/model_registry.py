@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import joblib
+import pandas as pd
+
+MODELS_DIR = "models"
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+METRICS_FILE = "model_metrics.joblib"
+
+def data_hash(df: pd.DataFrame) -> str:
+    """
+    SHA-256 of the values, index and column names of a DataFrame.
+    """
+
+    h = hashlib.sha256()
+    h.update(json.dumps(list(map(str, df.columns))).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+
+    return h.hexdigest()
+
+def file_checksum(path: str) -> str:
+    """
+    SHA-256 of a file's contents.
+    """
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+
+    return h.hexdigest()
+
+def _fsync_dir(path: str) -> None:
+    """
+    Make a rename inside `path` durable. Not supported on all platforms.
+    """
+
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """
+    Replace a file in one step, readers see either the old or the new contents.
+    """
+
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(os.path.dirname(path) or ".")
+
+def current_version(models_dir: str = MODELS_DIR) -> str:
+    """Name of the version the `CURRENT` pointer refers to.
+
+    Returns
+    -------
+    version : str or None
+        None if no version has been registered yet.
+    """
+
+    try:
+        with open(os.path.join(models_dir, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def version_dir(version: str, models_dir: str = MODELS_DIR) -> str:
+    return os.path.join(models_dir, VERSIONS_DIR, version)
+
+def read_manifest(version: str, models_dir: str = MODELS_DIR) -> dict:
+    with open(os.path.join(version_dir(version, models_dir), MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+def list_versions(models_dir: str = MODELS_DIR) -> list:
+    """
+    Names of all complete versions, oldest first.
+    """
+
+    root = os.path.join(models_dir, VERSIONS_DIR)
+    if not os.path.isdir(root):
+        return []
+
+    # Half-written versions live in hidden temporary directories
+    return sorted(v for v in os.listdir(root) if not v.startswith("."))
+
+def write_version(models: dict, metrics: dict, manifest: dict, models_dir: str = MODELS_DIR,
+                  reuse: dict = None, file_prefix: str = "rf") -> str:
+    """Save a set of party models as a new version and make it the current one.
+
+    All files are written to a temporary directory, which is renamed into
+    place once complete. Only then is the `CURRENT` pointer replaced, so
+    readers never see a partially written version or a mix of two versions.
+
+    Parameters
+    ----------
+    models : dict
+        Dictionary mapping party names to fitted models.
+    metrics : dict
+        Evaluation metrics, saved as 'model_metrics.joblib'.
+    manifest : dict
+        Information describing the training run (data hash, feature order,
+        hyperparameters, ...). Metrics and file checksums are added to it.
+    models_dir : str, default "models"
+        Root directory of the registry.
+    reuse : dict, optional
+        Dictionary mapping party names to model files of an earlier version
+        that are unchanged. These are hard-linked (or copied) instead of
+        being serialized again.
+    file_prefix : str, default "rf"
+        Party models are saved as '<file_prefix>_<party>.joblib'.
+
+    Returns
+    -------
+    version : str
+        Name of the new version.
+    """
+
+    version = time.strftime("%Y%m%dT%H%M%S") + "-" + manifest.get("data_hash", "")[:8]
+    if os.path.exists(version_dir(version, models_dir)):
+        version += f"-{os.getpid()}"
+
+    root = os.path.join(models_dir, VERSIONS_DIR)
+    tmp = os.path.join(root, f".tmp-{version}-{os.getpid()}")
+    os.makedirs(tmp)
+
+    reuse = reuse or {}
+
+    files = {}
+    for party, model in models.items():
+        files[party] = f"{file_prefix}_{party}.joblib"
+        path = os.path.join(tmp, files[party])
+        if party in reuse:
+            try:
+                os.link(reuse[party], path)
+            except OSError:
+                shutil.copy2(reuse[party], path)
+        else:
+            joblib.dump(model, path)
+    joblib.dump(metrics, os.path.join(tmp, METRICS_FILE))
+
+    manifest = dict(manifest)
+    manifest["version"] = version
+    manifest["created"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    manifest["files"] = files
+    manifest["metrics"] = metrics
+    manifest["checksums"] = {
+        file: file_checksum(os.path.join(tmp, file))
+        for file in list(files.values()) + [METRICS_FILE]
+    }
+
+    with open(os.path.join(tmp, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.rename(tmp, version_dir(version, models_dir))
+    _fsync_dir(root)
+
+    _write_atomic(os.path.join(models_dir, CURRENT_FILE), (version + "\n").encode())
+
+    return version
+
+def load_version(version: str = None, models_dir: str = MODELS_DIR, verify: bool = True) -> tuple:
+    """Load the party models and metrics of a registered version.
+
+    Parameters
+    ----------
+    version : str, optional
+        Version to load, the current one by default.
+    models_dir : str, default "models"
+        Root directory of the registry.
+    verify : bool, default True
+        Compare the files against the checksums in the manifest.
+
+    Returns
+    -------
+    models : dict
+        Dictionary mapping party names to fitted models.
+    metrics : dict
+        Evaluation metrics of the version.
+    manifest : dict
+        The version's manifest.
+
+    Raises
+    ------
+    FileNotFoundError
+        If no version is registered.
+    ValueError
+        If a file does not match its checksum.
+    """
+
+    version = version or current_version(models_dir)
+    if version is None:
+        raise FileNotFoundError(f"No model version registered in '{models_dir}'")
+
+    path = version_dir(version, models_dir)
+    manifest = read_manifest(version, models_dir)
+
+    if verify:
+        for file, checksum in manifest["checksums"].items():
+            if file_checksum(os.path.join(path, file)) != checksum:
+                raise ValueError(f"Checksum mismatch for {file} in model version {version}")
+
+    models = {party: joblib.load(os.path.join(path, file)) for party, file in manifest["files"].items()}
+    metrics = joblib.load(os.path.join(path, METRICS_FILE))
+
+    return models, metrics, manifest
+
+def collect_garbage(keep: int = 3, models_dir: str = MODELS_DIR) -> list:
+    """Delete all but the `keep` newest versions. The current version is always kept.
+
+    Returns
+    -------
+    removed : list of str
+        Names of the deleted versions.
+    """
+
+    current = current_version(models_dir)
+    versions = list_versions(models_dir)
+    retained = set(versions[-keep:]) if keep > 0 else set()
+
+    removed = []
+    for version in versions:
+        if version in retained or version == current:
+            continue
+        shutil.rmtree(version_dir(version, models_dir))
+        removed.append(version)
+
+    return removed
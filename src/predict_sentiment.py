@@ -1,18 +1,245 @@
+import os
+import threading
+import time
+
 import joblib
+import numpy as np
 import pandas as pd
 
+from model_registry import current_version, load_version
+from backends import get_backend, DEFAULT_BACKEND
+from features import FeaturePipeline
+
 parties = ["S", "M", "L", "C", "KD", "V", "MP", "SD"]
 
-models = {party: joblib.load(f"models/rf_{party}.joblib") for party in parties}
+MODELS_DIR = "models"
+
+class ModelGeneration:
+    """A set of party models loaded together from disk.
+
+    A generation is never modified after it has been published, so a
+    prediction that holds on to one generation always uses models from the
+    same training run.
+
+    Attributes
+    ----------
+    models : dict
+        Dictionary mapping each party name to its fitted model.
+    metrics : dict
+        Evaluation metrics saved alongside the models.
+    manifest : dict
+        Manifest of the registry version, empty for models saved directly
+        in the models directory.
+    features : list of str
+        Metrics a scenario consists of, in training order.
+    model_features : list of str
+        Column order the models were trained on: the metrics, followed by
+        derived features if the models were trained with them.
+    pipeline : FeaturePipeline or None
+        Computes the derived features of a scenario, None for models
+        trained on the metrics alone.
+    source, slope, offset : numpy.ndarray
+        Each model feature equals `slope * value + offset`, where value is
+        the metric `features[source]` of the scenario.
+    backend : ModelBackend
+        Kind of model, from the manifest. Models saved directly in the
+        models directory are Random Forests.
+    predict : callable
+        Predicts all parties for a DataFrame of scenarios with a column per
+        metric, returning an array with one column per party in `parties`
+        order.
+    version : int
+        Increasing number identifying the generation within this process.
+    signature : tuple
+        Registry version, or fingerprint of the model files, the
+        generation was loaded from.
+    derived : dict
+        Data precomputed from the models by functions registered with
+        `register_derived`, keyed by name.
+    """
+
+    def __init__(self, models: dict, metrics: dict, manifest: dict, version: int, signature: tuple):
+        self.models = models
+        self.metrics = metrics
+        self.manifest = manifest
+        self.model_features = list(models[parties[0]].feature_names_in_)
+        self.pipeline = FeaturePipeline.from_manifest(manifest)
+        self.backend = get_backend(manifest.get("backend", DEFAULT_BACKEND))
+
+        if self.pipeline is None:
+            self.features = self.model_features
+            self.source = np.arange(len(self.features))
+            self.slope, self.offset = np.ones(len(self.features)), np.zeros(len(self.features))
+            self.predict = self.backend.predictor(models, parties)
+        else:
+            self.features = self.pipeline.inputs
+            self.source, self.slope, self.offset = self.pipeline.affine(self.model_features)
+            predict_models = self.backend.predictor(models, parties)
+            self.predict = lambda X: predict_models(self.expand(X))
+        self.version = version
+        self.signature = signature
+        self.derived = {}
+
+    def expand(self, X) -> pd.DataFrame:
+        """
+        The model features of scenarios given as a DataFrame with a column
+        per metric, or an array with the metrics in `features` order.
+        """
+
+        if isinstance(X, pd.DataFrame):
+            X = X[self.features]
+        if self.pipeline is None:
+            return X if isinstance(X, pd.DataFrame) else pd.DataFrame(X, columns=self.features)
+
+        values = np.asarray(X, dtype=float)[:, self.source] * self.slope + self.offset
+        return pd.DataFrame(values, columns=self.model_features)
+
+def models_signature(models_dir: str = MODELS_DIR) -> tuple:
+    """
+    The current registry version, a single small read. Without a registry,
+    the name, size and modification time of every model file, which changes
+    whenever a file is rewritten.
+    """
+
+    version = current_version(models_dir)
+    if version is not None:
+        return ("version", version)
+
+    files = [f"rf_{party}.joblib" for party in parties] + ["model_metrics.joblib"]
+    signature = []
+
+    for file in files:
+        stat = os.stat(os.path.join(models_dir, file))
+        signature.append((file, stat.st_size, stat.st_mtime_ns))
+
+    return tuple(signature)
+
+_derived_builders = {}
+_reload_lock = threading.Lock()
+_generation = None
+
+def _load_generation(version: int) -> ModelGeneration:
+    """
+    Load all party models and build the registered derived data, without
+    publishing the result.
+    """
+
+    signature = models_signature()
+
+    if signature[0] == "version":
+        # Registry versions are never modified once written
+        models, metrics, manifest = load_version(signature[1], MODELS_DIR)
+    else:
+        models = {party: joblib.load(f"{MODELS_DIR}/rf_{party}.joblib") for party in parties}
+        metrics = joblib.load(f"{MODELS_DIR}/model_metrics.joblib")
+        manifest = {}
+
+        # Files rewritten while loading may be a mix of two training runs
+        if models_signature() != signature:
+            raise RuntimeError("Model files changed while loading")
+
+    generation = ModelGeneration(models, metrics, manifest, version, signature)
+    for name, builder in _derived_builders.items():
+        generation.derived[name] = builder(generation)
+
+    return generation
+
+def current_generation() -> ModelGeneration:
+    """
+    The generation new predictions should use. Callers should fetch it once
+    and use it for the whole request.
+    """
+
+    return _generation
+
+def register_derived(name: str, builder) -> None:
+    """Precompute data from the models of every generation.
+
+    `builder` is called with each newly loaded generation before it is
+    published, and its result is stored in `generation.derived[name]`.
+    It is also applied to the current generation right away.
+    """
+
+    with _reload_lock:
+        _derived_builders[name] = builder
+        _generation.derived[name] = builder(_generation)
+
+def reload_models() -> bool:
+    """Load the model files again if they changed and publish the new generation.
+
+    Loading and precomputation happen before the swap, so requests keep
+    being served by the old generation until the new one is complete.
 
-def predict_sentiment(user_input: dict) -> dict:
-    """Predict party polling percentages using pre-trained Random Forest models.
+    Returns
+    -------
+    reloaded : bool
+        True if a new generation was published.
+    """
+
+    global _generation
+
+    with _reload_lock:
+        if models_signature() == _generation.signature:
+            return False
+
+        generation = _load_generation(_generation.version + 1)
+
+        # Publishing is a single reference assignment
+        _generation = generation
+
+    return True
+
+def start_model_watcher(interval: float = 2.0) -> threading.Thread:
+    """Watch the models directory and reload the models when they change.
+
+    Only the small `CURRENT` pointer of the model registry is read on each
+    check. Without a registry, the files are reloaded once their signature
+    has been unchanged for one full interval, so a training run that is
+    still writing is not picked up halfway. Failed loads keep the current
+    generation and are retried.
+
+    Parameters
+    ----------
+    interval : float, default 2.0
+        Seconds between checks of the models directory.
+
+    Returns
+    -------
+    watcher : threading.Thread
+        The daemon thread running the watcher.
+    """
+
+    def watch():
+        previous = models_signature()
+        while True:
+            time.sleep(interval)
+            try:
+                signature = models_signature()
+                if signature == previous and signature != _generation.signature:
+                    if reload_models():
+                        print(f"Reloaded models (generation {_generation.version})")
+                previous = signature
+            except Exception as e:
+                print(f"Model reload failed, keeping current models: {e}")
+                previous = None
+
+    watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+    watcher.start()
+
+    return watcher
+
+_generation = _load_generation(version=1)
+
+def predict_sentiment(user_input: dict, generation: ModelGeneration = None) -> dict:
+    """Predict party polling percentages using the pre-trained party models.
 
     Parameters
     ----------
     user_input : dict
-        Dictionary containing feature values for prediction, 
+        Dictionary containing feature values for prediction,
         where keys match the columns used for training.
+    generation : ModelGeneration, optional
+        Models to predict with, the current generation by default.
 
     Returns
     -------
@@ -21,11 +248,48 @@ def predict_sentiment(user_input: dict) -> dict:
 
     Notes
     -----
-    - Expects pre-trained models saved as 'models/rf_<party>.joblib' 
-      for each party.
-    """
-    
-    X = pd.DataFrame([user_input])
-    predictions = {party: float(models[party].predict(X)[0]) for party in parties}
-        
-    return predictions
\ No newline at end of file
+    - Expects pre-trained models registered in 'models/versions/', or
+      Random Forests saved as 'models/rf_<party>.joblib' for each party.
+    - All parties are predicted with models from the same generation, even
+      if the models are reloaded meanwhile.
+    - In lookup serving mode (see `lookup_grid`), scenarios inside the
+      precomputed grid are answered from it, others are evaluated exactly.
+      Grids less accurate than the configured tolerance are not served.
+    """
+
+    generation = generation or current_generation()
+
+    grid = generation.derived.get("lookup_grid")
+    if grid is not None:
+        values = grid.lookup(np.array([[float(user_input[f]) for f in generation.features]]))
+        if values is not None:
+            return {party: float(value) for party, value in zip(parties, values)}
+
+    X = pd.DataFrame([user_input])[generation.features]
+    values = generation.predict(X)[0]
+    predictions = {party: float(value) for party, value in zip(parties, values)}
+
+    return predictions
+
+def predict_batch(X: pd.DataFrame, generation: ModelGeneration = None) -> pd.DataFrame:
+    """Predict party polling percentages for many scenarios in one pass.
+
+    Parameters
+    ----------
+    X : pandas.DataFrame
+        One scenario per row, with a column for every training feature.
+    generation : ModelGeneration, optional
+        Models to predict with, the current generation by default.
+
+    Returns
+    -------
+    predictions : pandas.DataFrame
+        One column per party, aligned with the index of `X`.
+    """
+
+    generation = generation or current_generation()
+
+    X = X[generation.features]
+    predictions = pd.DataFrame(generation.predict(X), index=X.index, columns=parties)
+
+    return predictions
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+class Superseded(Exception):
+    """
+    Raised for a request that a newer request from the same session replaced
+    before it was computed.
+    """
+
+class _Session:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latest = 0
+
+class RequestCoalescer:
+    """Compute only the newest of overlapping requests from each session.
+
+    Every request gets the next sequence number of its session when it
+    arrives. Requests of one session are computed one at a time, and a
+    request whose turn comes after a newer one has arrived is dropped
+    instead of computed. A burst of requests typed while one prediction
+    is running therefore costs a single further prediction.
+
+    Parameters
+    ----------
+    max_sessions : int, default 10000
+        Sessions kept track of, the least recently active are forgotten.
+
+    Attributes
+    ----------
+    requests, computed, coalesced : int
+        Number of requests received, computed and dropped as superseded.
+    """
+
+    def __init__(self, max_sessions: int = 10000):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self.requests = 0
+        self.computed = 0
+        self.coalesced = 0
+        self.compute_seconds = 0.0
+
+    def _session(self, session_id: str) -> _Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+
+        return session
+
+    def run(self, session_id: str, f, *args, **kwargs):
+        """Call `f(*args, **kwargs)` unless a newer request from the session arrived.
+
+        Raises
+        ------
+        Superseded
+            If a newer request from the same session arrived before this
+            one could be computed.
+        """
+
+        with self._lock:
+            session = self._session(session_id)
+            session.latest += 1
+            sequence = session.latest
+            self.requests += 1
+
+        with session.lock:
+            if sequence != session.latest:
+                with self._lock:
+                    self.coalesced += 1
+                raise Superseded
+
+            start = time.perf_counter()
+            result = f(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.computed += 1
+            self.compute_seconds += elapsed
+
+        return result
+
+    def stats(self) -> dict:
+        """
+        Counters since the server started, for monitoring.
+        """
+
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "computed": self.computed,
+                "coalesced": self.coalesced,
+                "coalesced_ratio": self.coalesced / self.requests if self.requests else 0.0,
+                "mean_compute_ms": 1000 * self.compute_seconds / self.computed if self.computed else 0.0,
+                "sessions": len(self._sessions),
+            }
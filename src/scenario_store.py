@@ -0,0 +1,249 @@
+import atexit
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from predict_sentiment import parties
+
+# Location of the store, relative to the project root
+DB_PATH = os.environ.get("SENTIMENT_SCENARIO_DB", os.path.join("data", "scenarios.db"))
+
+# Inputs of a scenario as entered in the app
+features = ["CPI", "EC", "GD", "MSR", "MIR", "Pop", "UR"]
+
+_columns = ["id", "created_at", "model_version"] + features + parties
+
+def _quoted(columns: list) -> str:
+    # Column names are case sensitive only when quoted
+    return ", ".join(f'"{c}"' for c in columns)
+
+_schema = f"""
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    model_version TEXT NOT NULL,
+    {", ".join(f'"{c}" REAL NOT NULL' for c in features)},
+    {", ".join(f'"{c}" REAL' for c in parties)}
+);
+CREATE UNIQUE INDEX IF NOT EXISTS scenarios_key
+    ON scenarios (model_version, {_quoted(features)});
+CREATE INDEX IF NOT EXISTS scenarios_version ON scenarios (model_version, id);
+"""
+
+def model_version(generation) -> str:
+    """
+    Name of the models a prediction was made with: the registry version, or
+    a hash of the model files for models saved directly in `models/`.
+    Predictions answered from the lookup grid are approximate and kept apart.
+    """
+
+    version = generation.manifest.get("version")
+    if version is None:
+        version = "files-" + hashlib.sha256(str(generation.signature).encode()).hexdigest()[:8]
+    if generation.derived.get("lookup_grid") is not None:
+        version += "+lookup"
+
+    return version
+
+class ScenarioStore:
+    """Scenarios and their predictions, saved in an SQLite database.
+
+    Scenarios are unique per model version, so a repeated scenario can be
+    answered from the store. New scenarios are queued and inserted by a
+    background thread in batches, so saving adds no database write to the
+    request. Until then they are answered from the queue.
+
+    Parameters
+    ----------
+    path : str, default DB_PATH
+        Database file, created if it does not exist.
+    batch_size : int, default 500
+        Largest number of scenarios inserted in one transaction.
+    flush_interval : float, default 0.5
+        Seconds the writer waits to gather a batch.
+    """
+
+    def __init__(self, path: str = DB_PATH, batch_size: int = 500, flush_interval: float = 0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = self._connection()
+        # Readers are not blocked by the writer
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_schema)
+
+        self._writer = threading.Thread(target=self._write, name="scenario-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections are used by the thread that opened them
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+
+        return connection
+
+    @staticmethod
+    def _key(version: str, user_input: dict) -> tuple:
+        return (version,) + tuple(float(user_input[f]) for f in features)
+
+    def get(self, version: str, user_input: dict):
+        """Saved predictions of a scenario.
+
+        Returns
+        -------
+        predictions : dict or None
+            Dictionary mapping each party name to its prediction, None if
+            the scenario was not saved for this model version.
+        """
+
+        key = self._key(version, user_input)
+
+        with self._pending_lock:
+            if key in self._pending:
+                return {p: self._pending[key][p] for p in parties}
+
+        where = " AND ".join(["model_version = ?"] + [f'"{c}" = ?' for c in features])
+        row = self._connection().execute(
+            f"SELECT {_quoted(parties)} FROM scenarios WHERE {where}", key
+        ).fetchone()
+
+        return None if row is None else dict(zip(parties, row))
+
+    def add(self, version: str, user_input: dict, predictions: dict) -> None:
+        """
+        Queue a scenario to be saved. Scenarios already saved for the same
+        model version are ignored.
+        """
+
+        key = self._key(version, user_input)
+        row = (time.time(),) + key + tuple(float(predictions[p]) for p in parties)
+
+        with self._pending_lock:
+            self._pending[key] = dict(zip(_columns[1:], row))
+        self._queue.put(key)
+
+    def _write(self) -> None:
+        connection = self._connection()
+        placeholders = ", ".join("?" * (len(_columns) - 1))
+        insert = f"INSERT OR IGNORE INTO scenarios ({_quoted(_columns[1:])}) VALUES ({placeholders})"
+
+        while True:
+            keys = [self._queue.get()]
+
+            # Gather a batch, a None from `flush` writes right away
+            deadline = time.monotonic() + self.flush_interval
+            while keys[-1] is not None and len(keys) < self.batch_size:
+                try:
+                    keys.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+
+            with self._pending_lock:
+                rows = [tuple(self._pending[k].values()) for k in keys if k in self._pending]
+
+            try:
+                with connection:
+                    connection.executemany(insert, rows)
+            except sqlite3.Error as e:
+                print(f"Saving {len(rows)} scenarios failed: {e}")
+
+            with self._pending_lock:
+                for k in keys:
+                    self._pending.pop(k, None)
+            for _ in keys:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """
+        Write the queued scenarios now and wait until they are written.
+        """
+
+        self._queue.put(None)
+        self._queue.join()
+
+    def page(self, before: int = None, limit: int = 20, version: str = None) -> list:
+        """Saved scenarios, newest first.
+
+        Pages are read from an index by keyset: pass the id of the last
+        scenario of a page as `before` to get the next one, which costs the
+        same no matter how many scenarios are saved. The first page also
+        lists queued scenarios that are not written yet, with id None.
+
+        Parameters
+        ----------
+        before : int, optional
+            Only scenarios with a smaller id, the newest by default.
+        limit : int, default 20
+            Number of scenarios.
+        version : str, optional
+            Only scenarios predicted by this model version.
+
+        Returns
+        -------
+        scenarios : list of dict
+            One dictionary per scenario with its id, time, model version,
+            inputs and predictions.
+        """
+
+        # Read the queue first, a scenario written meanwhile is then found in both
+        queued = []
+        if before is None:
+            with self._pending_lock:
+                queued = [
+                    {"id": None, **row} for row in self._pending.values()
+                    if version is None or row["model_version"] == version
+                ]
+            queued.sort(key=lambda row: row["created_at"], reverse=True)
+
+        conditions, params = [], []
+        if before is not None:
+            conditions.append("id < ?")
+            params.append(before)
+        if version is not None:
+            conditions.append("model_version = ?")
+            params.append(version)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        cursor = self._connection().execute(
+            f"SELECT * FROM scenarios {where} ORDER BY id DESC LIMIT ?", params + [limit]
+        )
+        names = [d[0] for d in cursor.description]
+        rows = [dict(zip(names, row)) for row in cursor]
+
+        written = {self._key(row["model_version"], row) for row in rows}
+        queued = [row for row in queued if self._key(row["model_version"], row) not in written]
+
+        return (queued + rows)[:limit]
+
+    def fetch(self, ids: list) -> list:
+        """
+        Saved scenarios by id, in the order of `ids`.
+        """
+
+        if not ids:
+            return []
+
+        cursor = self._connection().execute(
+            f"SELECT * FROM scenarios WHERE id IN ({', '.join('?' * len(ids))})", list(ids)
+        )
+        names = [d[0] for d in cursor.description]
+        rows = {row[0]: dict(zip(names, row)) for row in cursor}
+
+        return [rows[i] for i in ids if i in rows]
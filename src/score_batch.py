@@ -0,0 +1,221 @@
+import argparse
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from predict_sentiment import parties, predict_batch, current_generation
+
+def validate_chunk(chunk: pd.DataFrame, first_line: int) -> pd.DataFrame:
+    """Check that a chunk of scenarios has all feature columns with numeric values.
+
+    Parameters
+    ----------
+    chunk : pandas.DataFrame
+        Rows read from the input CSV.
+    first_line : int
+        Line number of the first row of the chunk in the input file,
+        used in error messages.
+
+    Returns
+    -------
+    X : pandas.DataFrame
+        The feature columns of `chunk` as floats, in training order.
+
+    Raises
+    ------
+    ValueError
+        If a feature column is missing or a value is empty or not numeric.
+    """
+
+    features = current_generation().features
+
+    missing = [feature for feature in features if feature not in chunk.columns]
+    if missing:
+        raise ValueError(f"Input is missing feature columns: {', '.join(missing)}")
+
+    X = chunk[features].apply(pd.to_numeric, errors="coerce")
+
+    invalid = X.isna().any(axis=1).to_numpy().nonzero()[0]
+    if len(invalid) > 0:
+        lines = ", ".join(str(first_line + i) for i in invalid[:5])
+        raise ValueError(f"Missing or non-numeric feature values on line(s) {lines}")
+
+    return X.astype(float)
+
+def score_chunk(chunk: pd.DataFrame, first_line: int) -> pd.DataFrame:
+    """
+    Validate a chunk and append one prediction column per party.
+    """
+
+    X = validate_chunk(chunk, first_line)
+    predictions = predict_batch(X)
+
+    return pd.concat([chunk, predictions.add_prefix("pred_")], axis=1)
+
+def _init_worker() -> None:
+    """
+    Workers run in parallel already, keep each forest on a single core.
+    """
+
+    for model in current_generation().models.values():
+        model.n_jobs = 1
+
+class _CsvWriter:
+    """
+    Appends scored chunks to a CSV file, writing the header once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header = True
+
+    def write(self, df: pd.DataFrame) -> None:
+        df.to_csv(self.path, mode="w" if self.header else "a", header=self.header, index=False)
+        self.header = False
+
+    def close(self) -> None:
+        pass
+
+class _ParquetWriter:
+    """Appends scored chunks as row groups of a single Parquet file.
+
+    Every row group must have the same schema, but pandas infers the type
+    of a pass-through column per chunk. The schema is fixed from the first
+    chunk and every later chunk is cast to it, so an integer column with
+    missing values in a later chunk stays integer. A column with no values
+    in the first chunk has no type to fix, it is written as text.
+    """
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow, install it with 'pip install pyarrow'")
+
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.writer = None
+        self.schema = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        table = self.pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.schema = self.pa.schema([
+                field.with_type(self.pa.string()) if column.null_count == len(column) else field
+                for field, column in zip(table.schema, table.columns)
+            ]).remove_metadata()
+            self.writer = self.pq.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(self._cast(table))
+
+    def _cast(self, table):
+        columns = []
+        for field, column in zip(self.schema, table.columns):
+            try:
+                columns.append(column.cast(field.type))
+            except (self.pa.ArrowInvalid, self.pa.ArrowNotImplementedError) as e:
+                raise ValueError(
+                    f"Column '{field.name}' changed type from {field.type} to {column.type} "
+                    f"after the first chunk and cannot be converted: {e}"
+                )
+
+        return self.pa.Table.from_arrays(columns, schema=self.schema)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+def score_file(input_path: str, output_path: str, chunksize: int = 100_000,
+               workers: int = 1, output_format: str = None) -> int:
+    """Score a scenario CSV file chunk by chunk and stream the results to disk.
+
+    Only a bounded number of chunks is held in memory at any time, so memory
+    use does not grow with the size of the input.
+
+    Parameters
+    ----------
+    input_path : str
+        CSV file with one scenario per row and a column per feature.
+        Additional columns are passed through to the output.
+    output_path : str
+        Destination file.
+    chunksize : int, default 100000
+        Number of rows read and scored at a time.
+    workers : int, default 1
+        Number of worker processes. With 1, chunks are scored in this process.
+    output_format : {"csv", "parquet"}, optional
+        Output format, inferred from the `output_path` suffix if not given.
+
+    Returns
+    -------
+    n_rows : int
+        Number of rows scored.
+    """
+
+    if output_format is None:
+        output_format = "parquet" if output_path.endswith((".parquet", ".pq")) else "csv"
+
+    writer = _ParquetWriter(output_path) if output_format == "parquet" else _CsvWriter(output_path)
+
+    reader = pd.read_csv(input_path, chunksize=chunksize)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+
+    # Header is line 1, first data row is line 2
+    first_line = 2
+    n_rows = 0
+    start = time.perf_counter()
+
+    def report(scored: pd.DataFrame) -> None:
+        nonlocal n_rows
+        writer.write(scored)
+        n_rows += len(scored)
+        elapsed = time.perf_counter() - start
+        print(f"\r{n_rows:,} rows scored, {n_rows / elapsed:,.0f} rows/sec", end="", file=sys.stderr)
+
+    try:
+        if pool is None:
+            for chunk in reader:
+                report(score_chunk(chunk, first_line))
+                first_line += len(chunk)
+        else:
+            # Keep a few chunks in flight per worker and write them in input order
+            pending = deque()
+            for chunk in reader:
+                pending.append(pool.submit(score_chunk, chunk, first_line))
+                first_line += len(chunk)
+                if len(pending) >= 2 * workers:
+                    report(pending.popleft().result())
+            while pending:
+                report(pending.popleft().result())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        writer.close()
+        print(file=sys.stderr)
+
+    return n_rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV file of scenarios with the party models.")
+    parser.add_argument("input", help="CSV file with columns " + ", ".join(current_generation().features))
+    parser.add_argument("output", help="output file, .csv or .parquet")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="rows per chunk (default 100000)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default 1)")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="output format, inferred from the output suffix by default")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        n_rows = score_file(args.input, args.output, args.chunksize, args.workers, args.format)
+    except (ValueError, ImportError) as e:
+        sys.exit(f"Error: {e}")
+    elapsed = time.perf_counter() - start
+
+    print(f"Scored {n_rows:,} rows for {len(parties)} parties in {elapsed:.1f} s, saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
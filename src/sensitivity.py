@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+from predict_sentiment import parties, predict_batch, current_generation, register_derived
+from backends import RandomForestBackend
+
+def split_thresholds(generation) -> dict:
+    """Collect the split thresholds of every tree in every party forest.
+
+    Parameters
+    ----------
+    generation : ModelGeneration
+        Party models to collect the thresholds from.
+
+    Returns
+    -------
+    thresholds : dict or None
+        Dictionary mapping each feature name to a sorted array of the unique 
+        thresholds any tree splits that feature on, including splits on its
+        derived features mapped back to the metric's value. None for
+        backends that are not Random Forests.
+    """
+
+    if not isinstance(generation.backend, RandomForestBackend):
+        return None
+
+    collected = {feature: [] for feature in generation.features}
+
+    for model in generation.models.values():
+        for tree in model.estimators_:
+            split = tree.tree_.feature >= 0
+            for j in range(len(generation.model_features)):
+                # Derived features split where their metric crosses the mapped threshold
+                source, slope, offset = generation.source[j], generation.slope[j], generation.offset[j]
+                if slope == 0:
+                    continue
+                threshold = tree.tree_.threshold[split & (tree.tree_.feature == j)]
+                collected[generation.features[source]].append((threshold - offset) / slope)
+
+    return {feature: np.unique(np.concatenate(t)) for feature, t in collected.items()}
+
+# Precomputed once per generation of models
+register_derived("thresholds", split_thresholds)
+
+def default_range(feature: str, padding: float = 0.05, generation=None) -> tuple:
+    """
+    Range covering every split threshold of a feature, padded on both sides.
+    Outside of it no prediction changes. For backends without thresholds,
+    the range of the training data recorded in the manifest.
+    """
+
+    generation = generation or current_generation()
+    thresholds = generation.derived["thresholds"]
+
+    if thresholds is not None and len(thresholds[feature]) > 0:
+        low, high = thresholds[feature][0], thresholds[feature][-1]
+    else:
+        low, high = generation.manifest["feature_ranges"][feature]
+    span = high - low
+    
+    return (low - padding * span, high + padding * span)
+
+def sensitivity_sweep(base: dict, n_points: int = 200, ranges: dict = None, generation=None) -> dict:
+    """Partial-dependence curves around a base scenario, one per feature.
+
+    Each feature is swept over a grid while the other six are held at their 
+    base values. Trees compare feature values as float32 against their split 
+    thresholds, so grid points falling between the same pair of thresholds 
+    share a prediction. Only one point per such interval is evaluated, and 
+    the intervals of all seven features are predicted in a single batch.
+    Backends other than Random Forests are evaluated on every grid point.
+
+    Parameters
+    ----------
+    base : dict
+        Feature values of the base scenario, keys matching the training columns.
+    n_points : int, default 200
+        Number of grid points per feature.
+    ranges : dict, optional
+        Dictionary mapping feature names to (low, high) sweep ranges. 
+        Features without an entry use `default_range`.
+    generation : ModelGeneration, optional
+        Models to sweep, the current generation by default.
+
+    Returns
+    -------
+    curves : dict
+        Dictionary mapping each feature name to a DataFrame indexed by the 
+        grid values, with one column of predictions per party.
+    """
+
+    if n_points < 2:
+        raise ValueError("n_points must be at least 2")
+
+    # Thresholds and predictions must come from the same models
+    generation = generation or current_generation()
+    features = generation.features
+    thresholds = generation.derived["thresholds"]
+
+    ranges = ranges or {}
+    base_row = np.array([float(base[feature]) for feature in features])
+
+    grids = {}
+    blocks = []
+    inverses = {}
+    offset = 0
+
+    for j, feature in enumerate(features):
+        low, high = ranges.get(feature) or default_range(feature, generation=generation)
+        grid = np.linspace(low, high, n_points)
+
+        if thresholds is not None:
+            # Interval index of every grid point, as seen by the trees
+            interval = np.searchsorted(thresholds[feature], grid.astype(np.float32), side="left")
+            _, first, inverse = np.unique(interval, return_index=True, return_inverse=True)
+        else:
+            first = inverse = np.arange(n_points)
+
+        rows = np.tile(base_row, (len(first), 1))
+        rows[:, j] = grid[first]
+
+        grids[feature] = grid
+        blocks.append(rows)
+        inverses[feature] = inverse + offset
+        offset += len(first)
+
+    X = pd.DataFrame(np.vstack(blocks), columns=features)
+    predictions = predict_batch(X, generation).to_numpy()
+
+    curves = {
+        feature: pd.DataFrame(
+            predictions[inverses[feature]],
+            index=pd.Index(grids[feature], name=feature),
+            columns=parties
+        )
+        for feature in features
+    }
+
+    return curves
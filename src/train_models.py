@@ -1,17 +1,111 @@
+import hashlib
+import json
+import os
+import sys
+import time
+
 import joblib
+import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, r2_score
 import pandas as pd
 
-def train_party_model(df: pd.DataFrame, X: pd.DataFrame, parties: list) -> dict:
-    """Train a separate Random Forest regression model for each political party 
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from model_registry import write_version, data_hash, current_version, read_manifest, version_dir
+from backends import ModelBackend, get_backend
+from features import FeaturePipeline
+
+split_parameters = {"random_state": 42, "test_size": 0.2}
+
+def _reset_peak_rss() -> bool:
+    """
+    Reset the peak resident memory of the process to its current use.
+    Only possible on Linux, returns False elsewhere.
+    """
+
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def report_peak_rss(stage: str) -> None:
+    """Print the peak resident memory of a stage of training.
+
+    On Linux the peak is reset after every report, so each report covers
+    the stage since the previous one. Elsewhere only the peak of the whole
+    process is known, and it is reported as such.
+    """
+
+    try:
+        with open("/proc/self/status") as f:
+            peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        peak_kb = None
+
+    if peak_kb is not None and _reset_peak_rss():
+        print(f"Peak RSS during {stage}: {peak_kb / 2**10:.1f} MB")
+        return
+
+    if resource is None:
+        return
+
+    # Kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    scale = 2**20 if sys.platform == "darwin" else 2**10
+    print(f"Peak RSS of the process up to the end of {stage}: {peak / scale:.1f} MB")
+
+def party_fingerprint(X_hash: str, y: pd.Series, params: dict) -> str:
+    """
+    Fingerprint of everything a party model depends on: the feature matrix,
+    the party's target column and the model and split parameters.
+    """
+
+    h = hashlib.sha256()
+    h.update(X_hash.encode())
+    h.update(data_hash(y.to_frame()).encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+
+    return h.hexdigest()
+
+def _previous_run() -> tuple:
+    """
+    Manifest and directory of the current registry version, if it records
+    fingerprints that unchanged parties can be reused from.
+    """
+
+    version = current_version()
+    if version is None:
+        return {}, None
+
+    manifest = read_manifest(version)
+    if "fingerprints" not in manifest:
+        return {}, None
+
+    return manifest, version_dir(version)
+
+def train_party_model(df: pd.DataFrame, X: pd.DataFrame, parties: list, force: bool = False,
+                      backend: ModelBackend = None, pipeline: FeaturePipeline = None) -> dict:
+    """Train a separate regression model for each political party 
     using macroeconomic and demographic features.
 
     Each model is trained to predict the monthly polling percentage for 
-    the corresponding party. The trained models are saved to disk in the 
-    'models' directory as 'rf_<party>.joblib'.
-    
+    the corresponding party. The trained models are saved together as a 
+    new version in the model registry under 'models/versions/', with a 
+    manifest describing the run, and then made the current version.
+
+    Parties whose feature matrix, target column and parameters are unchanged
+    since the current version are not refitted, their model files and
+    metrics are reused. If no party changed, no new version is written.
+
+    All parties share one train/test split. The train and test rows of `X`
+    are selected once, and only the target column is indexed per party.
+
     Parameters
     ----------
     df : pandas.DataFrame
@@ -20,28 +114,72 @@ def train_party_model(df: pd.DataFrame, X: pd.DataFrame, parties: list) -> dict:
         DataFrame containing the feature columns used for prediction.
     parties : list of str
         List of party column names in `df` to train separate models for.
-    
+    force : bool, default False
+        Refit every party, even if its inputs are unchanged.
+    backend : ModelBackend, optional
+        Kind of model to train, by default the deployment's backend
+        (see `backends.get_backend`).
+    pipeline : FeaturePipeline, optional
+        Derived features included in `X` (see `features.add_features`),
+        saved in the manifest so that serving can compute them.
+
     Returns
     -------
     models : dict
         Dictionary where keys are party names and values are the trained 
-        RandomForestRegressor models.
+        models.
     """
-    
+
     models = {}
     metrics = {}
+    fingerprints = {}
+    fit_seconds = {}
+    reused = {}
 
     r2_scores = []
     mse_scores = []
-    
+
+    backend = backend or get_backend()
+    params = {
+        "backend": backend.name,
+        "model": type(backend.make_estimator()).__name__,
+        "hyperparameters": backend.make_estimator().get_params(),
+        "split": split_parameters,
+    }
+    if pipeline is not None:
+        # The saved history is part of the models
+        params["feature_pipeline"] = pipeline.to_dict()
+    X_hash = data_hash(X)
+    previous, previous_dir = ({}, None) if force else _previous_run()
+
+    # Same rows as splitting X and each target together
+    train_idx, test_idx = train_test_split(np.arange(len(X)), **split_parameters)
+    X_train, X_test = None, None
+
     for party in parties:
         y_party = df[party]
-        
-        X_train, X_test, y_train, y_test = train_test_split(X, y_party, random_state=42, test_size=0.2)
+        fingerprints[party] = party_fingerprint(X_hash, y_party, params)
+
+        if previous.get("fingerprints", {}).get(party) == fingerprints[party]:
+            path = os.path.join(previous_dir, previous["files"][party])
+            models[party] = joblib.load(path)
+            metrics[party] = previous["metrics"][party]
+            fit_seconds[party] = previous["fit_seconds"][party]
+            reused[party] = path
 
-        model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)  
+            r2_scores.append(metrics[party]["r2"])
+            mse_scores.append(metrics[party]["mse"])
+            continue
+
+        start = time.perf_counter()
+
+        if X_train is None:
+            X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
+        y_train, y_test = y_party.iloc[train_idx], y_party.iloc[test_idx]
+
+        model = backend.make_estimator()
         model.fit(X_train, y_train)
-        
+
         y_pred = model.predict(X_test)
 
         mse = mean_squared_error(y_test, y_pred)
@@ -55,15 +193,39 @@ def train_party_model(df: pd.DataFrame, X: pd.DataFrame, parties: list) -> dict:
         mse_scores.append(mse)
 
         models[party] = model
-        
-        joblib.dump(model, f"models/rf_{party}.joblib")
+        fit_seconds[party] = time.perf_counter() - start
 
     metrics["average"] = {
         "mse": float(sum(mse_scores) / len(mse_scores)),
         "r2": float(sum(r2_scores) / len(r2_scores))
     }
-    
-    joblib.dump(metrics, "models/model_metrics.joblib")
 
-    return models
+    report_peak_rss("training")
+
+    if reused:
+        saved = sum(fit_seconds[party] for party in reused)
+        print(f"Skipped unchanged parties: {', '.join(reused)} (saved about {saved:.1f} s)")
 
+    if len(reused) == len(parties):
+        print("All parties are up to date, no new version written")
+        return models
+
+    manifest = {
+        "data_hash": data_hash(df),
+        "features": list(X.columns),
+        "feature_ranges": {c: [float(X[c].min()), float(X[c].max())] for c in X.columns},
+        "parties": list(parties),
+        "backend": backend.name,
+        "model": params["model"],
+        "hyperparameters": params["hyperparameters"],
+        "split": split_parameters,
+        "fingerprints": fingerprints,
+        "fit_seconds": fit_seconds,
+    }
+    if pipeline is not None:
+        manifest["feature_pipeline"] = pipeline.to_dict()
+
+    write_version(models, metrics, manifest, reuse=reused, file_prefix=backend.file_prefix)
+    report_peak_rss("saving")
+
+    return models
@@ -0,0 +1,72 @@
+"""
+Explanations of models trained with derived features must add up to the
+prediction for scenarios typed in by users, with one decimal.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from features import FeatureConfig, FeaturePipeline, derive
+from model_registry import write_version
+
+features = ["CPI", "EC", "GD", "MSR", "MIR", "Pop", "UR"]
+parties = ["S", "M", "L", "C", "KD", "V", "MP", "SD"]
+
+@pytest.fixture
+def derived_generation(tmp_path, monkeypatch):
+    """
+    A registry version of forests trained on the metrics with lags, a
+    rolling mean and the delta, as with `main.py --lags 1,3 --rolling 3
+    --delta`, served by the predict_sentiment module.
+    """
+
+    monkeypatch.chdir(tmp_path)
+    config = FeatureConfig(lags=(1, 3), rolling=(3,), delta=True)
+
+    # Monthly series rounded to one decimal, like the published statistics
+    rng = np.random.default_rng(0)
+    months = pd.period_range("2000-01", periods=240, freq="M")
+    columns, history = [], {}
+    for name in features:
+        s = pd.Series(np.cumsum(rng.normal(0, 0.3, len(months))).round(1) + 5, index=months, name=name)
+        columns += [s, derive(s, config)]
+        history[name] = s.to_numpy()[len(s) - config.lookback:].tolist()
+    X = pd.concat(columns, axis=1).iloc[config.lookback:]
+
+    models = {}
+    for i, party in enumerate(parties):
+        y = X @ rng.normal(0, 1, X.shape[1])
+        models[party] = RandomForestRegressor(n_estimators=10, max_depth=8, random_state=i).fit(X, y)
+
+    pipeline = FeaturePipeline(config, history)
+    manifest = {"backend": "random_forest", "data_hash": "c" * 16, "features": list(X.columns),
+                "feature_pipeline": pipeline.to_dict()}
+    write_version(models, {}, manifest, "models")
+
+    import predict_sentiment
+    predict_sentiment.reload_models()
+    import explain
+
+    yield predict_sentiment, explain, X
+
+def test_explanations_add_up_on_rounded_scenarios(derived_generation):
+    predict_sentiment, explain, X = derived_generation
+
+    assert predict_sentiment.current_generation().features == features
+
+    rng = np.random.default_rng(1)
+    low, high = X[features].min(), X[features].max()
+    for _ in range(200):
+        scenario = {f: round(rng.uniform(low[f], high[f]), 1) for f in features}
+        explanation = explain.explain_sentiment(scenario)
+        prediction = predict_sentiment.predict_sentiment(scenario)
+
+        assert list(explanation.columns) == ["base"] + features
+        for party in parties:
+            assert explanation.loc[party].sum() == pytest.approx(prediction[party], abs=1e-9), scenario
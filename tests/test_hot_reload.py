@@ -0,0 +1,115 @@
+"""
+Predictions running concurrently with model reloads must each use the
+models of a single generation, never a mix of two.
+"""
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model_registry import write_version, _write_atomic, CURRENT_FILE
+
+features = ["CPI", "EC", "GD", "MSR", "MIR", "Pop", "UR"]
+parties = ["S", "M", "L", "C", "KD", "V", "MP", "SD"]
+
+def _party_models(shift: float, seed: int) -> dict:
+    """
+    Small forests whose predictions differ by `shift` per party between
+    the two versions, so a result mixing versions is recognisable.
+    """
+
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.uniform(0, 10, (200, len(features))), columns=features)
+    models = {}
+    for i, party in enumerate(parties):
+        model = RandomForestRegressor(n_estimators=3, max_depth=3, random_state=i)
+        models[party] = model.fit(X, X["UR"] + shift * (i + 1))
+
+    return models
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """
+    Two registry versions in a temporary models directory, with the
+    predict_sentiment module serving the first one.
+    """
+
+    monkeypatch.chdir(tmp_path)
+    versions = []
+    for shift, data_hash in [(1.0, "a" * 16), (100.0, "b" * 16)]:
+        manifest = {"backend": "random_forest", "data_hash": data_hash, "features": features}
+        versions.append(write_version(_party_models(shift, seed=len(versions)), {}, manifest, "models"))
+
+    def point_to(version):
+        _write_atomic(os.path.join("models", CURRENT_FILE), (version + "\n").encode())
+
+    point_to(versions[0])
+
+    # Importing loads the current version, later imports only reload it
+    import predict_sentiment
+    predict_sentiment.reload_models()
+
+    yield predict_sentiment, versions, point_to
+
+def test_predictions_use_one_generation_during_reloads(registry):
+    predict_sentiment, versions, point_to = registry
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(0, 10, (50, len(features))), columns=features)
+    scenario = X.iloc[0].to_dict()
+
+    # Expected outputs of each version, loaded on their own
+    expected_single, expected_batch = [], []
+    for version in versions:
+        point_to(version)
+        predict_sentiment.reload_models()
+        generation = predict_sentiment.current_generation()
+        assert generation.signature == ("version", version)
+        expected_single.append(predict_sentiment.predict_sentiment(scenario, generation))
+        expected_batch.append(predict_sentiment.predict_batch(X, generation).to_numpy())
+
+    assert all(expected_single[0][p] != expected_single[1][p] for p in parties)
+
+    stop = threading.Event()
+    singles, batches, errors = [], [], []
+
+    def predict_loop():
+        try:
+            while not stop.is_set():
+                singles.append(predict_sentiment.predict_sentiment(scenario))
+                batches.append(predict_sentiment.predict_batch(X).to_numpy())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=predict_loop) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+
+    reloads = 0
+    try:
+        for i in range(40):
+            point_to(versions[i % 2])
+            reloads += predict_sentiment.reload_models()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert not errors
+    assert reloads == 40
+    assert singles and batches
+
+    for result in singles:
+        assert result in expected_single, f"prediction mixes model versions: {result}"
+    for result in batches:
+        assert any(np.array_equal(result, expected) for expected in expected_batch), \
+            "batch prediction mixes model versions"
+
+    # Both versions were actually served while reloading
+    assert {expected_single.index(r) for r in singles} == {0, 1}
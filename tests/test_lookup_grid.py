@@ -0,0 +1,111 @@
+"""
+Cells of the lookup grid must match how the trees route scenarios, and
+a grid is only served if it is saved and within the tolerance.
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model_registry import write_version
+
+features = ["CPI", "EC", "GD", "MSR", "MIR", "Pop", "UR"]
+parties = ["S", "M", "L", "C", "KD", "V", "MP", "SD"]
+
+@pytest.fixture
+def lookup_grid(tmp_path, monkeypatch):
+    """
+    The lookup_grid module, serving a registry version of forests that only
+    split on UR from a temporary directory.
+    """
+
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(0, 10, (200, len(features))), columns=features)
+    models = {}
+    for i, party in enumerate(parties):
+        model = RandomForestRegressor(n_estimators=3, max_depth=3, random_state=i)
+        models[party] = model.fit(X, X["UR"].round() + i)
+
+    manifest = {"backend": "random_forest", "data_hash": "d" * 16, "features": features,
+                "feature_ranges": {f: [0.0, 10.0] for f in features}}
+    write_version(models, {}, manifest, "models")
+
+    import predict_sentiment
+    predict_sentiment.reload_models()
+    import lookup_grid
+
+    yield lookup_grid
+
+def _grid(lookup_grid, boundaries: list):
+    low = np.array([-10.0] * len(boundaries))
+    high = np.array([10.0] * len(boundaries))
+    n_cells = int(np.prod([len(b) + 1 for b in boundaries]))
+    values = np.arange(n_cells * len(parties), dtype=np.float32).reshape(n_cells, len(parties))
+
+    return lookup_grid.LookupGrid([np.array(b) for b in boundaries], low, high, values, {})
+
+def test_cells_put_boundary_values_in_the_cell_below(lookup_grid):
+    grid = _grid(lookup_grid, [[1.0, 2.0], [0.5]])
+
+    assert grid.shape == (3, 2)
+    X = np.array([[0.0, 0.0], [1.0, 0.5], [1.5, 0.6], [2.0, 1.0], [2.5, -1.0]])
+    assert grid.cells(X).tolist() == [0, 0, 3, 3, 4]
+
+    # Like the trees, values are compared as float32
+    assert grid.cells(np.array([[2.0 + 1e-9, 0.5 + 1e-9]])).tolist() == [2]
+
+def test_covers_includes_the_range_ends(lookup_grid):
+    grid = _grid(lookup_grid, [[1.0], [0.5]])
+
+    X = np.array([[-10.0, 10.0], [0.0, 0.0], [-10.1, 0.0], [0.0, 10.1]])
+    assert grid.covers(X).tolist() == [True, True, False, False]
+    assert grid.lookup(np.array([[0.0, 10.1]])) is None
+    assert grid.lookup(np.array([[1.5, 0.0]])).tolist() == grid.values[2].tolist()
+
+def test_representatives_fall_in_their_own_cell(lookup_grid):
+    # Neighbouring float32 boundaries leave room for a single value between them
+    b = np.float32(3.3)
+    boundaries = np.array([1.0, float(b), float(np.nextafter(b, np.float32(np.inf))), 7.25])
+    points = lookup_grid._representatives(boundaries, 0.0, 10.0)
+
+    grid = _grid(lookup_grid, [boundaries])
+    assert grid.cells(points[:, None]).tolist() == list(range(len(boundaries) + 1))
+    assert points[0] >= 0.0 and points[-1] <= 10.0
+
+def test_serving_only_uses_saved_grids_within_the_tolerance(lookup_grid, monkeypatch):
+    generation = lookup_grid.current_generation()
+
+    # Missing grids are not built when serving
+    assert lookup_grid._grid_for_serving(generation) is None
+    assert not os.path.exists(lookup_grid.CACHE_DIR)
+
+    grid = lookup_grid.build_grid(generation, max_cells=10_000, n_samples=1000)
+    assert grid.info["max_error"] < 1e-4
+    assert not any("lookup_grid" in f for _, _, files in os.walk("models") for f in files)
+
+    served = lookup_grid._grid_for_serving(generation)
+    assert served is not None
+    X = pd.DataFrame(np.random.default_rng(1).uniform(0, 10, (100, len(features))), columns=features)
+    np.testing.assert_allclose(served.values[served.cells(X.to_numpy())], generation.predict(X), atol=1e-4)
+
+    # A grid above the tolerance is skipped, and not rebuilt
+    report = lookup_grid._cache_path(generation, lookup_grid.CACHE_DIR) + ".json"
+    with open(report, encoding="utf-8") as f:
+        info = json.load(f)
+    info["max_error"] = 5.0
+    with open(report, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+
+    monkeypatch.setattr(lookup_grid, "tolerance", 1.0)
+    assert lookup_grid._grid_for_serving(generation) is None
+    assert json.load(open(report, encoding="utf-8"))["max_error"] == 5.0
+
+    monkeypatch.setattr(lookup_grid, "tolerance", 10.0)
+    assert lookup_grid._grid_for_serving(generation) is not None